@@ -0,0 +1,204 @@
+import curses
+import json
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from datetime import date
+
+import toml
+
+from options import option
+
+# number of tasks in each data set, with a habit of each type for every thousand tasks
+SIZES = [100, 10_000, 100_000]
+
+# size of the terminal the views are drawn for (the content window leaves out 3 rows)
+HEIGHT, WIDTH = 40, 120
+
+# the views drawn by content(), as (name, outer option, inner option, map settings)
+VIEWS = [
+    ("tasks/list", 0, 0, {}),
+    ("tasks/day", 0, 1, {}),
+    ("tasks/week", 0, 2, {}),
+    ("tasks/month", 0, 3, {}),
+    ("tasks/year", 0, 4, {}),
+    ("habits/duration/day", 1, 0, {"based_on": 0}),
+    ("habits/duration/habit", 1, 0, {"based_on": 1}),
+    ("habits/progress/day", 1, 1, {"based_on": 0}),
+    ("habits/progress/habit", 1, 1, {"based_on": 1}),
+    ("habits/heatmap/day", 1, 2, {"based_on": 0, "index": -30}),
+    ("habits/heatmap/week", 1, 2, {"based_on": 1, "index": -364}),
+    ("habits/heatmap/month", 1, 2, {"based_on": 2, "index": -12}),
+    ("habits/heatmap/year", 1, 2, {"based_on": 3, "index": -3}),
+    ("habits/heatmap/calendar", 1, 2, {"based_on": 4}),
+    ("habits/manage", 1, 3, {}),
+    ("habits/new", 1, 4, {}),
+    ("lists", 2, 0, {}),
+    ("logs", 3, 0, {}),
+]
+
+USAGE = (
+    "usage: python bench.py [--sizes N,N,...] [--frames N] [--seed N] [--backend json|sqlite] "
+    "[--save FILE] [--compare FILE] [--tolerance X]"
+)
+
+def percentile(times, percent):
+    """return a percentile of a sorted list of times (nearest rank)."""
+    return times[max(math.ceil(percent / 100 * len(times)) - 1, 0)]
+
+def run(size, frames, seed, backend):
+    """
+    draw every view on a data set written to ~/.dots (the home directory is a scratch
+    directory, see bench), and print the timings and memory use as json.
+    """
+    data_dir = os.path.join(os.path.expanduser("~"), ".dots")
+    os.makedirs(data_dir, exist_ok=True)
+    config = toml.load(os.path.join(os.path.dirname(__file__), "config.toml"))
+    config["storage"]["backend"] = backend
+    with open(os.path.join(data_dir, "config.toml"), 'w', encoding='utf-8') as file:
+        toml.dump(config, file)
+
+    # the views read the config when they are imported, so it has to be written first
+    # pylint: disable=import-outside-toplevel
+    import headless
+    from generate import write_data
+    from content import content
+    from modules import Task, Habit
+    from storage import import_json
+
+    write_data(data_dir, size, seed)
+    if backend == "sqlite":
+        import_json()
+    headless.install()
+    window = headless.FakeWindow(HEIGHT - 3, WIDTH)
+    day = date.today().isoformat()
+
+    start = time.perf_counter()
+    Task.load_tasks()
+    Habit.load_habits()
+    result = {"load_ms": (time.perf_counter() - start) * 1000, "views": {}}
+
+    def draw(outer_option, inner_option, settings):
+        window.erase()
+        try:
+            content(
+                window, outer_option, inner_option, [2, 0],
+                False, "", "", 0, "", day,
+                {"based_on": 0, "index": 0, "index2": 0, **settings},
+                {"name": " ", "type": "progress", "unit": "", "target_value": 1.0},
+                False, {}
+            )
+        except curses.error:
+            return False  # the view does not fit, which main shows as a message
+        return True
+
+    for name, outer_option, inner_option, settings in VIEWS:
+        times = []
+        for _ in range(frames + 1):
+            start = time.perf_counter()
+            fits = draw(outer_option, inner_option, settings)
+            times.append((time.perf_counter() - start) * 1000)
+        warm = sorted(times[1:])
+        result["views"][name] = {
+            "first_ms": times[0],
+            "p50_ms": percentile(warm, 50),
+            "p90_ms": percentile(warm, 90),
+            "p99_ms": percentile(warm, 99),
+            "fits": fits,
+        }
+
+    # memory is traced in a pass of its own, as tracing slows down the frames
+    tracemalloc.start()
+    for name, outer_option, inner_option, settings in VIEWS:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        draw(outer_option, inner_option, settings)
+        result["views"][name]["peak_kb"] = (tracemalloc.get_traced_memory()[1] - base) / 1024
+    tracemalloc.stop()
+
+    # the maximum resident set size is in kilobytes on linux (bytes on macos)
+    result["rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps(result))
+
+def bench(sizes, frames, seed, backend):
+    """run each data set in a process of its own, with a scratch home directory."""
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as home:
+            output = subprocess.run(
+                [
+                    sys.executable, __file__, "--run", str(size), "--frames", str(frames),
+                    "--seed", str(seed), "--backend", backend
+                ],
+                env={**os.environ, "HOME": home}, stdout=subprocess.PIPE, text=True, check=True
+            ).stdout
+        results[str(size)] = json.loads(output.splitlines()[-1])
+        report(size, results[str(size)])
+    return results
+
+def report(size, result):
+    """print the results of a data set as a table."""
+    print(
+        f"\n{size} tasks: loaded in {result['load_ms']:.1f} ms, "
+        f"peak rss {result['rss_kb'] / 1024:.1f} MB"
+    )
+    print(f"{'view':<26}{'first':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'peak mem':>12}")
+    for name, view in result["views"].items():
+        print(
+            f"{name:<26}{view['first_ms']:>8.2f}ms{view['p50_ms']:>8.2f}ms"
+            f"{view['p90_ms']:>8.2f}ms{view['p99_ms']:>8.2f}ms{view['peak_kb']:>10.0f}kB"
+            + ("" if view['fits'] else "  (too small)")
+        )
+
+def compare(results, baseline, tolerance):
+    """
+    print how the median frame of each view changed from a baseline, and return whether
+    any of them got slower by more than the tolerance (e.g. 0.2 for 20%).
+    """
+    regressed = False
+    for size, result in results.items():
+        if size not in baseline:
+            continue
+        print(f"\n{size} tasks, compared to the baseline:")
+        for name, view in result["views"].items():
+            if name not in baseline[size]["views"]:
+                continue
+            before = baseline[size]["views"][name]["p50_ms"]
+            change = view["p50_ms"] / before - 1 if before else 0
+            slower = change > tolerance
+            regressed |= slower
+            print(
+                f"{name:<26}{before:>8.2f}ms -> {view['p50_ms']:>8.2f}ms {change:>+8.0%}"
+                + ("  slower" if slower else "")
+            )
+    return regressed
+
+def main():
+    frames = int(option("--frames", 20, USAGE))
+    seed = int(option("--seed", 0, USAGE))
+    backend = option("--backend", "json", USAGE)
+    size = option("--run", None, USAGE)
+    if size is not None:
+        run(int(size), frames, seed, backend)
+        return
+    sizes = option("--sizes", ",".join(map(str, SIZES)), USAGE)
+    results = bench([int(size) for size in sizes.split(",")], frames, seed, backend)
+    save = option("--save", None, USAGE)
+    if save is not None:
+        with open(save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=4)
+    baseline = option("--compare", None, USAGE)
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        if compare(results, baseline, float(option("--tolerance", 0.2, USAGE))):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
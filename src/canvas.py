@@ -0,0 +1,181 @@
+import curses
+
+from itertools import groupby
+
+class Canvas:
+    """
+    a line buffer in front of a curses window, which the views draw into instead of the
+    window. it takes the same calls as a window (addstr, insstr, chgat, move, erase, ...),
+    and raises curses.error for writes outside of it like a window does, but only records
+    each call under the line it draws on. refresh() compares the calls made on each line
+    with the ones that were last drawn on the window, only draws the lines that changed and
+    marks the window for the next curses.doupdate(), so that a frame is sent to the terminal
+    at once instead of once per window.
+    """
+
+    # a line is kept as a copy of its cells instead once this many calls were made on it
+    max_calls = 64
+
+    def __init__(self, window, size=None):
+        self.window = window  # None for a canvas that is only drawn into, of the given size
+        self.height, self.width = size or window.getmaxyx()
+        self.y = self.x = 0  # the cursor
+        self.lines = []  # the calls made on each line
+        self.shown = None
+        self.resize(self.height, self.width)
+
+    def resize(self, height, width):
+        """resize the canvas and its window, and start over with a blank canvas."""
+        if self.window is not None and self.window.getmaxyx() != (height, width):
+            self.window.resize(height, width)
+        self.height, self.width = height, width
+        self.erase()
+        self.shown = None  # the calls of each line when it was last drawn, None if unknown
+
+    def getmaxyx(self):
+        # the window is resized by curses when the terminal is
+        if self.window is not None and self.window.getmaxyx() != (self.height, self.width):
+            self.resize(*self.window.getmaxyx())
+        return self.height, self.width
+
+    def mvwin(self, y, x):
+        """move the window on the screen, which draws all of it again."""
+        self.window.mvwin(y, x)
+        self.shown = None
+
+    def getyx(self):
+        return self.y, self.x
+
+    def move(self, y, x):
+        if not (0 <= y < self.height and 0 <= x < self.width):
+            raise curses.error("move() returned ERR")
+        self.y, self.x = y, x
+
+    def record(self, y, call):
+        """add a call to a line, as (name, x, text or count, attribute)."""
+        calls = self.lines[y]
+        calls.append(call)
+        if len(calls) > self.max_calls:
+            # e.g. a line of a window that is never erased
+            chars, attrs = self.render(y)
+            self.lines[y] = [("cells", 0, "".join(chars), tuple(attrs))]
+
+    def addstr(self, *args):
+        # views make hundreds of these calls a frame, so the arguments are unpacked inline
+        if len(args) >= 3:
+            y, x, text = args[0], args[1], args[2]
+            if not (0 <= y < self.height and 0 <= x < self.width):
+                raise curses.error("addwstr() returned ERR")
+        else:
+            y, x, text = self.y, self.x, args[0]
+        attr = args[-1] if len(args) in (2, 4) else 0
+        if x + len(text) < self.width:
+            self.record(y, ("addstr", x, text, attr))
+            self.y, self.x = y, x + len(text)
+            return
+
+        # the text wraps, and is recorded in pieces for each line
+        while True:
+            n = self.width - x
+            if x == 0 and len(text) >= n:
+                self.lines[y] = []  # the whole line is drawn over
+            self.record(y, ("addstr", x, text[:n], attr))
+            if len(text) < n:
+                self.y, self.x = y, x + len(text)
+                return
+            text = text[n:]
+            if y == self.height - 1:
+                # the cursor can't move past the last cell
+                self.y, self.x = y, self.width - 1
+                raise curses.error("addwstr() returned ERR")
+            y, x = y + 1, 0
+            if not text:
+                self.y, self.x = y, x
+                return
+
+    def addch(self, *args):
+        self.addstr(*args)
+
+    def insstr(self, *args):
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        self.record(self.y, ("insstr", self.x, args[0], args[1] if len(args) > 1 else 0))
+
+    def chgat(self, *args):
+        if len(args) >= 3:
+            self.move(args[0], args[1])
+            args = args[2:]
+        count, attr = args if len(args) == 2 else (-1, args[0])
+        self.record(self.y, ("chgat", self.x, count, attr))
+
+    def erase(self):
+        self.getmaxyx()
+        self.y = self.x = 0
+        self.lines = [[] for _ in range(self.height)]
+
+    def clear(self):
+        """erase the canvas, and paint the whole screen again on the next update."""
+        self.erase()
+        self.touchwin()
+        self.window.clearok(True)
+
+    def touchwin(self):
+        """
+        draw every line on the next refresh, e.g. after another window was drawn over
+        this one.
+        """
+        self.shown = None
+        self.window.touchwin()
+
+    def render(self, y):
+        """return the characters and attributes of the cells of a line."""
+        chars, attrs = [" "] * self.width, [0] * self.width
+        for name, x, value, attr in self.lines[y]:
+            match name:
+                case "addstr":
+                    chars[x:x + len(value)] = value
+                    attrs[x:x + len(value)] = [attr] * len(value)
+                case "insstr":
+                    chars[x:] = (list(value) + chars[x:])[:self.width - x]
+                    attrs[x:] = ([attr] * len(value) + attrs[x:])[:self.width - x]
+                case "chgat":
+                    end = self.width if value < 0 else min(x + value, self.width)
+                    attrs[x:end] = [attr] * (end - x)
+                case "cells":
+                    chars, attrs = list(value), list(attr)
+        return chars, attrs
+
+    def draw(self, y):
+        """draw a line on the window, by making the calls recorded for it."""
+        self.window.move(y, 0)
+        self.window.clrtoeol()
+        for name, x, value, attr in self.lines[y]:
+            try:
+                match name:
+                    case "addstr":
+                        self.window.addstr(y, x, value, attr)
+                    case "insstr":
+                        self.window.insstr(y, x, value, attr)
+                    case "chgat":
+                        self.window.chgat(y, x, value, attr)
+                    case "cells":
+                        for cell_attr, cells in groupby(zip(value, attr), lambda cell: cell[1]):
+                            text = "".join(char for char, _ in cells)
+                            self.window.addstr(y, x, text, cell_attr)
+                            x += len(text)
+            except curses.error:
+                pass  # the last cell is drawn, but the cursor can't move past it
+
+    def refresh(self):
+        """draw the lines that changed on the window, and mark it for curses.doupdate()."""
+        if self.shown is None:
+            self.shown = [None] * self.height
+        for y, calls in enumerate(self.lines):
+            if calls != self.shown[y]:
+                self.draw(y)
+                self.shown[y] = list(calls)
+        self.window.noutrefresh()
+
+    def noutrefresh(self):
+        self.refresh()
@@ -20,20 +20,20 @@ def content(
     text_input, text_mode, text_box, text_index,
     removing, day,
     map_settings, new_habit,
-    hide_completed
+    hide_completed, scroll
 ):
     """generate content window."""
     if outer_option == 0:
         if inner_option == 0:
-            display_tasks(window, selected, text_mode, removing, hide_completed)
+            display_tasks(window, selected, text_mode, removing, hide_completed, scroll)
         elif inner_option == 1:
-            day_view(window, selected, day, removing, hide_completed)
+            day_view(window, selected, day, removing, hide_completed, scroll)
         elif inner_option == 2:
-            week_view(window, selected, day, removing, hide_completed)
+            week_view(window, selected, day, removing, hide_completed, scroll)
         elif inner_option == 3:
-            month_view(window, selected, day, removing, hide_completed)
+            month_view(window, selected, day, removing, hide_completed, scroll)
         elif inner_option == 4:
-            year_view(window, selected, day, removing, hide_completed)
+            year_view(window, selected, day, removing, hide_completed, scroll)
     elif outer_option == 1:
         if inner_option == 0:
             duration_maps(window, selected, map_settings)
@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from datetime import date, datetime as dt
+from functools import lru_cache
+
+# dates are stored as yyyy-mm-dd strings, and session times as yyyy-mm-dd-hh:mm strings.
+# they are converted to day numbers (days since 0001-01-01, so 0001-01-01 is day 1) and
+# minute numbers (minutes since the start of day 0) once per string, and compared, sorted
+# and bucketed as integers from there.
+
+@lru_cache(maxsize=65536)
+def day_ordinal(day):
+    """return a yyyy-mm-dd date as a day number. raises ValueError otherwise."""
+    if len(day) == 10 and day[4] == day[7] == "-" and day.replace("-", "").isdigit():
+        # date() checks the month and the day
+        return date(int(day[:4]), int(day[5:7]), int(day[8:10])).toordinal()
+    # dates typed in by hand can leave out the leading zeros
+    return dt.strptime(day, "%Y-%m-%d").toordinal()
+
+@lru_cache(maxsize=65536)
+def ordinal_day(ordinal):
+    """return a day number as a yyyy-mm-dd date."""
+    return date.fromordinal(ordinal).isoformat()
+
+def parse_day(day):
+    """return a yyyy-mm-dd date as a date."""
+    return date.fromordinal(day_ordinal(day))
+
+def shift_day(day, days):
+    """return the yyyy-mm-dd date a number of days after (or before, if negative) a date."""
+    return ordinal_day(day_ordinal(day) + days)
+
+def weekday(day):
+    """return the day of the week of a yyyy-mm-dd date (monday is 0, sunday is 6)."""
+    return (day_ordinal(day) - 1) % 7
+
+def today_ordinal():
+    """return the local date as a day number."""
+    return date.today().toordinal()
+
+@lru_cache(maxsize=65536)
+def timestamp_minute(timestamp):
+    """return a yyyy-mm-dd-hh:mm timestamp as a minute number. raises ValueError otherwise."""
+    if len(timestamp) == 16 and timestamp[10] == "-" and timestamp[13] == ":":
+        day, hour, minute = timestamp[:10], timestamp[11:13], timestamp[14:16]
+        if not (hour + minute).isdigit() or int(hour) > 23 or int(minute) > 59:
+            raise ValueError(f"time data {timestamp!r} does not match format '%Y-%m-%d-%H:%M'")
+        return day_ordinal(day) * 1440 + int(hour) * 60 + int(minute)
+    # times typed in by hand can leave out the leading zeros
+    time = dt.strptime(timestamp, "%Y-%m-%d-%H:%M")
+    return time.toordinal() * 1440 + time.hour * 60 + time.minute
+
+def typed_timestamp(timestamp):
+    """
+    return a yyyy-mm-dd-hh:mm timestamp typed in by hand, zero-padded the way it is stored.
+    raises ValueError otherwise.
+    """
+    dt.strptime(timestamp, "%Y-%m-%d-%H:%M")
+    return minute_timestamp(timestamp_minute(timestamp))
+
+def minute_timestamp(minute):
+    """return a minute number as a yyyy-mm-dd-hh:mm timestamp."""
+    day, minute = divmod(minute, 1440)
+    return f"{ordinal_day(day)}-{minute // 60:02}:{minute % 60:02}"
+
+def minute_datetime(minute):
+    """return a minute number as a datetime."""
+    day, minute = divmod(minute, 1440)
+    return dt.combine(date.fromordinal(day), dt.min.time()).replace(
+        hour=minute // 60, minute=minute % 60
+    )
+
+class Timestamps:
+    """
+    the minute numbers of the timestamps in a data set, which an index keeps across builds.
+    the cache of timestamp_minute only holds so many timestamps, so with more sessions than
+    that every build would parse most of them again. this holds every timestamp the index
+    looked up, and drops the ones it no longer has when it is built again.
+    """
+
+    def __init__(self):
+        self.minutes = {}
+        self.previous = {}  # the minutes known before the build in progress
+
+    @contextmanager
+    def building(self):
+        """keep only the timestamps looked up inside the block, reusing the known minutes."""
+        self.previous, self.minutes = self.minutes, {}
+        try:
+            yield
+        finally:
+            self.previous = {}
+
+    def minute(self, timestamp):
+        """return a timestamp as a minute number, only parsing it if it is not known yet."""
+        minute = self.minutes.get(timestamp)
+        if minute is None:
+            minute = self.previous.get(timestamp)
+            if minute is None:
+                minute = timestamp_minute(timestamp)
+            self.minutes[timestamp] = minute
+        return minute
+
+def cache_misses():
+    """
+    return how many date and timestamp strings missed the caches of day_ordinal and
+    timestamp_minute since startup, and so had to be parsed.
+    """
+    return day_ordinal.cache_info().misses + timestamp_minute.cache_info().misses
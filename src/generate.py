@@ -0,0 +1,178 @@
+import json
+import os
+import random
+import shutil
+import sys
+import uuid
+
+from datetime import date, timedelta, datetime as dt
+
+from modules import Task, Habit, DurationHabit
+from options import option
+
+TAGS = ["work", "school", "home", "errands", "health", "reading", "chores", "later"]
+
+# how deep subtasks are nested at most, and how often a task is a subtask of another
+MAX_DEPTH = 6
+SUBTASK_RATE = 0.4
+
+USAGE = "usage: python generate.py DIR [--scale N] [--habits N] [--years N] [--seed N] [--force]"
+
+def random_id(rng):
+    """return a uuid4 drawn from rng, so that the same seed gives the same ids."""
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def random_day(rng, today, start, end):
+    """return a yyyy-mm-dd date from start to end days after today."""
+    return (today + timedelta(days=rng.randint(start, end))).isoformat()
+
+def generate_tasks(rng, count, years, today):
+    """
+    return count tasks, due from years ago up to a year ahead. about 40% are subtasks of a
+    task added shortly before, nested up to MAX_DEPTH deep, and due no later than it. some
+    were migrated a few times (with their migrations in date_history), and some have tags
+    and recur.
+    """
+    tasks = {}
+    depths = {}
+    recent = []  # tasks that were added last, which new subtasks are added to
+    for i in range(count):
+        parents = [task_id for task_id in recent if depths[task_id] < MAX_DEPTH]
+        parent = rng.choice(parents) if parents and rng.random() < SUBTASK_RATE else None
+        last_due = tasks[parent]['due_date'] if parent else None
+
+        due = random_day(rng, today, -365 * years, 365)
+        if last_due:
+            due = min(due, last_due)
+        task = Task(f"task {i}", due_date=due, priority=rng.choice([1, 2, 2, 3]))
+        task.id = random_id(rng)
+        task.date_added = random_day(rng, date.fromisoformat(due), -30, 0)
+        task.completed = due < today.isoformat() and rng.random() < 0.8
+        task.tags = rng.sample(TAGS, rng.choice([0, 0, 1, 1, 2, 3]))
+
+        # tasks migrated on their due day, each time to a later day
+        if rng.random() < 0.2:
+            history = [[task.date_added, due]]
+            for _ in range(rng.randint(1, 3)):
+                moved = random_day(rng, date.fromisoformat(due), 1, 14)
+                if last_due and moved > last_due:
+                    break  # not past the parent
+                history.append([due, moved])
+                due = moved
+            if len(history) > 1:
+                task.date_history = history
+                task.due_date = due
+
+        if rng.random() < 0.1:
+            interval = rng.choice(["day", "week", "month"])
+            task.recurrence = {
+                "interval": interval,
+                "days": sorted(rng.sample(range(7), rng.randint(1, 3)))
+                if interval == "week" else [],
+            }
+
+        if parent:
+            task.parent = parent
+            tasks[parent]['subtasks'].append(task.id)
+            depths[task.id] = depths[task.parent] + 1
+        else:
+            depths[task.id] = 0
+
+        tasks[task.id] = vars(task)
+        recent = (recent + [task.id])[-20:]
+    return tasks
+
+def generate_habits(rng, count, years, today):
+    """
+    return count habits of each type, with a record for most days of the last years:
+    sessions (some of them across midnight, split the way the app splits them) for duration
+    habits, and values for progress and frequency habits.
+    """
+    habits = {}
+    days = [today - timedelta(days=i) for i in reversed(range(365 * years))]
+    for i in range(count):
+        habit = DurationHabit(f"sleep {i}", target_value=8)
+        for day in days:
+            midnight = dt.combine(day, dt.min.time())
+            if rng.random() < 0.9:
+                # going to bed before or after midnight, and sleeping 5 to 9 hours
+                start = midnight + timedelta(minutes=rng.randint(21 * 60, 26 * 60))
+                end = start + timedelta(minutes=rng.randint(5 * 60, 9 * 60))
+                habit.data.extend(DurationHabit.split_duration_record([
+                    start.strftime("%Y-%m-%d-%H:%M"), end.strftime("%Y-%m-%d-%H:%M")
+                ]))
+            if rng.random() < 0.3:
+                start = midnight + timedelta(minutes=rng.randint(9 * 60, 17 * 60))
+                end = start + timedelta(minutes=rng.randint(15, 180))
+                habit.data.append(
+                    [start.strftime("%Y-%m-%d-%H:%M"), end.strftime("%Y-%m-%d-%H:%M")]
+                )
+        habit.data.sort(key=lambda session: session[0])
+
+        for habit in [
+            habit,
+            Habit(f"water {i}", "progress", "cup/cups", rng.randint(4, 10)),
+            Habit(f"pushups {i}", "frequency", "time/times", ""),
+        ]:
+            habit.id = random_id(rng)
+            if habit.type != "duration":
+                # days without any progress are left out, like the app does
+                habit.data = {
+                    day.isoformat(): rng.randint(1, 12)
+                    for day in days if rng.random() < 0.7
+                }
+            habits[habit.id] = vars(habit)
+    return habits
+
+def write_data(data_dir, tasks, seed=0, habits=None, years=3, force=False):
+    """
+    write tasks.json and habits.json with a synthetic data set into data_dir: tasks tasks,
+    and habits habits of each type (one for every thousand tasks by default) with years of
+    records. the dates are relative to today, and the same seed always writes the same data
+    on the same day. existing data is only replaced if force is set.
+    """
+    os.makedirs(data_dir, exist_ok=True)
+    for name in ["tasks.json", "habits.json"]:
+        if os.path.exists(os.path.join(data_dir, name)) and not force:
+            raise FileExistsError(f"{os.path.join(data_dir, name)} already exists")
+    if habits is None:
+        habits = max(1, tasks // 1000)
+
+    # the views need a config file next to the data
+    if not os.path.exists(os.path.join(data_dir, "config.toml")):
+        shutil.copy(
+            os.path.join(os.path.dirname(__file__), "config.toml"),
+            os.path.join(data_dir, "config.toml")
+        )
+
+    rng = random.Random(seed)
+    today = date.today()
+    for name, items in [
+        ("tasks", generate_tasks(rng, tasks, years, today)),
+        ("habits", generate_habits(rng, habits, years, today)),
+    ]:
+        for path in [f"{name}.json", f"{name}.json.journal"]:
+            if os.path.exists(os.path.join(data_dir, path)):
+                os.remove(os.path.join(data_dir, path))
+        with open(os.path.join(data_dir, f"{name}.json"), 'w', encoding='utf-8') as file:
+            json.dump(items, file)
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1].startswith("-"):
+        sys.exit(USAGE)
+    try:
+        write_data(
+            sys.argv[1],
+            int(option("--scale", 1000, USAGE)),
+            seed=int(option("--seed", 0, USAGE)),
+            habits=int(option("--habits", 0, USAGE)) or None,
+            years=int(option("--years", 3, USAGE)),
+            force="--force" in sys.argv,
+        )
+    except FileExistsError as error:
+        print(f"{error}, pass --force to replace it.")
+        sys.exit(1)
+    print(f"data written to {sys.argv[1]}.")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,15 @@
 import curses
 import datetime
 import math
-import calendar
 
 from datetime import timedelta, time, datetime as dt
 from dateutil.relativedelta import relativedelta
 
-from misc import display_borders
+from misc import display_borders, cached_layout
 from modules import Habit
+from dates import (
+    day_ordinal, ordinal_day, parse_day, today_ordinal, timestamp_minute, minute_datetime
+)
 
 def get_records_from_habits(habits, index):
     """
@@ -27,138 +29,147 @@ def get_records_from_habits(habits, index):
 
     return records
 
-def duration_maps(window, selected, map_settings):
+def get_daily_records(habit):
     """
-    prints a duration map, with bars starting and ending based on time.
+    retrieves the records of a progress/frequency habit for every day, from its first record
+    up to today. days without a record are read as zero.
+    """
+    today = today_ordinal()
+    days = [day_ordinal(day) for day in habit['data']]
+    start_day = min([*days, today])
+    end_day = max([*days, today])
+    return {
+        ordinal_day(day): habit['data'].get(ordinal_day(day), 0)
+        for day in range(start_day, end_day + 1)
+    }
+
+def duration_layout(window, based_on, index):
+    """
+    returns what a duration map shows that doesn't depend on the selection: the day or habit
+    it is on, the hours along the top and the bars of each row that fits, or None if there
+    are no duration habits.
     """
-    display_borders(window, selected)
-    based_on = ["day", "habit"][map_settings['based_on'] % 2]
-    index = map_settings['index']
-
-    window.addstr(2, 5, "duration habits")
-    window.addstr(4, 5, "based on: ")
-    window.addstr(f"< {based_on} >", curses.color_pair(1 + (selected[0] == 2)))
-
     habits = Habit.load_habits()
     habits = {habit: habits[habit] for habit in habits if habits[habit]['type'] == "duration"}
+    if not habits:
+        return None
 
-    if habits:
-        if based_on == "day":
-            day = datetime.date.today() + timedelta(days=index)
-            on = day.strftime("%Y-%m-%d")
-            # all records that start or end on this day (fetch date from datetime)
-            records = {habit: [
-                record for record in habits[habit]['data'] if record[0][:10] == on
-            ] for habit in habits}
+    if based_on == "day":
+        day = datetime.date.today() + timedelta(days=index)
+        on = day.strftime("%Y-%m-%d")
+        # all records that start on this day, which are sorted by start time
+        sessions = Habit.index("sessions")
+        records = {habit: sessions.on_day(habit, on) for habit in habits}
+
+        try:
+            earliest_time = minute_datetime(min(
+                timestamp_minute(records[habit][0][0]) for habit in records if records[habit]
+            ))
+            latest_time = minute_datetime(max(
+                timestamp_minute(record[1]) for habit in records for record in records[habit]
+            ))
+        except:
+            earliest_time = dt.combine(day, time(hour=0, minute=0, second=0))
+            latest_time = dt.combine(day, time(hour=12, minute=0, second=0))
 
             try:
-                earliest_time = min(
-                    min(
-                        dt.strptime(record[0], "%Y-%m-%d-%H:%M") for record in records[habit]
-                    ) for habit in records if records[habit]
-                )
-                latest_time = max(
-                    max(
-                        dt.strptime(record[1], "%Y-%m-%d-%H:%M") for record in records[habit]
-                    ) for habit in records if records[habit]
-                )
+                # ensure earliest_time aligns to the nearest hour
+                # (if necessary adjustments are needed)
+                earliest_time = earliest_time.replace(minute=0, second=0)
             except:
+                # fallback in case of errors
                 earliest_time = dt.combine(day, time(hour=0, minute=0, second=0))
-                latest_time = dt.combine(day, time(hour=12, minute=0, second=0))
-
-                try:
-                    # ensure earliest_time aligns to the nearest hour
-                    # (if necessary adjustments are needed)
-                    earliest_time = earliest_time.replace(minute=0, second=0)
-                except:
-                    # fallback in case of errors
-                    earliest_time = dt.combine(day, time(hour=0, minute=0, second=0))
-
-            latest_time_diff = math.ceil((latest_time - earliest_time) / timedelta(hours=1))
-
-        else:
-            habitid = list(habits.keys())[index % len(habits)]
-            raw_records = habits[habitid]['data']
-            on = habits[habitid]['name']
-
-            # find periods and analyze the least recorded times
-            # create a count for each hour in a 24-hour format
-            hour_counts = [0] * 24
-            for record in raw_records:
-                start_dt = dt.strptime(record[0], "%Y-%m-%d-%H:%M")
-                end_dt = dt.strptime(record[1], "%Y-%m-%d-%H:%M")
-                for hour in range(start_dt.hour, end_dt.hour + 1):
-                    hour_counts[hour % 24] += 1
-
-            # find the hour with the least records
-            earliest_record = min(
-                raw_records, key=lambda r: dt.strptime(r[0], "%Y-%m-%d-%H:%M").hour
-            )
-            earliest_time = dt.strptime(earliest_record[0], "%Y-%m-%d-%H:%M")
-            latest_time_diff = 24
-
-            records = get_records_from_habits(habits, index)
-
-        window.addstr(6, 5, f"< {on} >", curses.color_pair(1 + (selected[0] == 3)))
 
-        max_length = max(
-            len(habits[habit]['name']) for habit in records
-        ) if based_on == "day" else 10
-        max_width = window.getmaxyx()[1] - 13 - max_length
+        latest_time_diff = math.ceil((latest_time - earliest_time) / timedelta(hours=1))
 
+    else:
+        habitid = list(habits.keys())[index % len(habits)]
+        on = habits[habitid]['name']
+
+        # find the session that starts at the earliest hour of the day (midnight if none)
+        starts = Habit.index("sessions").starts.get(habitid)
+        earliest_time = minute_datetime(min(
+            starts or [datetime.date.today().toordinal() * 1440],
+            key=lambda start: start % 1440 // 60
+        ))
+        latest_time_diff = 24
+
+        records = get_records_from_habits(habits, index)
+
+    max_length = max(
+        len(habits[habit]['name']) for habit in records
+    ) if based_on == "day" else 10
+    max_width = window.getmaxyx()[1] - 13 - max_length
+
+    try:
+        hour_width = max_width // (latest_time_diff)
+    except:
+        hour_width = 0
+    else:
+        hour_widths = [4, 6, 12]
+        hour_widths = [
+            width for width in hour_widths
+            if width * (latest_time_diff) <= max_width
+        ]
+        gaps = [abs(hour_width - width) for width in hour_widths]
         try:
-            hour_width = max_width // (latest_time_diff)
+            hour_width = hour_widths[gaps.index(min(gaps))]
         except:
-            hour_width = 0
-        else:
-            hour_widths = [4, 6, 12]
-            hour_widths = [
-                width for width in hour_widths
-                if width * (latest_time_diff) <= max_width
-            ]
-            gaps = [abs(hour_width - width) for width in hour_widths]
-            try:
-                hour_width = hour_widths[gaps.index(min(gaps))]
-            except:
-                hour_width = 4
+            hour_width = 4
+
+    hours = [
+        (7 + max_length + round(hour_width * x), str((earliest_time.hour) + x % 24).rjust(2, "0"))
+        for x in range(latest_time_diff + 1)
+    ]
+
+    records = dict(sorted(records.items()))
+
+    rows = []
+    for i, record in enumerate(records):
+        if i + 9 <= window.getmaxyx()[0] - 6:
+            name = habits[record]["name"] if based_on == "day" else record
+            bars = []
+            for entry in records[record]:
+                entry = [timestamp_minute(e) % 1440 // 60 for e in entry]
+                width = hour_width * ((entry[1] - entry[0]) % 24)
+                message = " " * width
+                if len(message) > width:
+                    message = message[:width-3] + "..."
+                duration_hours = (
+                    entry[0] - earliest_time.hour
+                )
+                bars.append((8 + max_length + hour_width * (duration_hours % 24), message))
+            rows.append((name.rjust(max_length), bars))
+    return {"on": on, "hours": hours, "rows": rows}
 
-        for x in range(latest_time_diff + 1):
-            window.addstr(
-                8, 7 + max_length + round(hour_width * x),
-                str((earliest_time.hour) + x % 24).rjust(2, "0")
-            )
+def duration_maps(window, selected, map_settings):
+    """
+    prints a duration map, with bars starting and ending based on time.
+    """
+    display_borders(window, selected)
+    based_on = ["day", "habit"][map_settings['based_on'] % 2]
+    index = map_settings['index']
+
+    window.addstr(2, 5, "duration habits")
+    window.addstr(4, 5, "based on: ")
+    window.addstr(f"< {based_on} >", curses.color_pair(1 + (selected[0] == 2)))
 
-        records = dict(sorted(records.items()))
+    layout = cached_layout(
+        "habits/duration",
+        (based_on, index, today_ordinal(), Habit.version(), window.getmaxyx()),
+        lambda: duration_layout(window, based_on, index)
+    )
 
-        for i, record in enumerate(records):
-            if i + 9 <= window.getmaxyx()[0] - 6:
-                if based_on == "day":
-                    window.addstr(
-                        9 + i, 5,
-                        habits[record]["name"].rjust(max_length),
-                        curses.color_pair(1 + (selected[0] == i + 4))
-                    )
-                else:
-                    window.addstr(
-                        9 + i, 5,
-                        record.rjust(max_length),
-                        curses.color_pair(1 + (selected[0] == i + 4))
-                    )
-                count = 0
-                for entry in records[record]:
-                    count += 1
-                    entry = [dt.strptime(e, "%Y-%m-%d-%H:%M").hour for e in entry]
-                    width = hour_width * ((entry[1] - entry[0]) % 24)
-                    message = " " * width
-                    if len(message) > width:
-                        message = message[:width-3] + "..."
-                    duration_hours = (
-                        entry[0] - earliest_time.hour
-                    )
-                    window.addstr(
-                        9 + i, 8 + max_length + hour_width * (duration_hours % 24),
-                        message, curses.color_pair(2)
-                    )
+    if layout:
+        window.addstr(6, 5, f"< {layout['on']} >", curses.color_pair(1 + (selected[0] == 3)))
+
+        for x, hour in layout["hours"]:
+            window.addstr(8, x, hour)
+
+        for i, (name, bars) in enumerate(layout["rows"]):
+            window.addstr(9 + i, 5, name, curses.color_pair(1 + (selected[0] == i + 4)))
+            for x, message in bars:
+                window.addstr(9 + i, x, message, curses.color_pair(2))
     else:
         window.addstr(
             8, 5,
@@ -166,19 +177,12 @@ def duration_maps(window, selected, map_settings):
             curses.color_pair(1 + (selected[0] == 3))
         )
 
-def progress_maps(window, selected, map_settings):
+def progress_layout(window, based_on, index):
     """
-    prints a progress map, with progress bars.
+    returns what a progress map shows that doesn't depend on the selection: the day or habit
+    it is on, the scale along the top and the bar and value of each row that fits, or None
+    if there are no progress habits.
     """
-    display_borders(window, selected)
-    based_on = ["day", "habit"][map_settings['based_on'] % 2]
-    index = map_settings['index']
-
-    window.addstr(2, 5, "progress habits")
-
-    window.addstr(4, 5, "based on: ")
-    window.addstr(f"< {based_on} >", curses.color_pair(1 + (selected[0] == 2)))
-
     habits = Habit.load_habits()
 
     # filter habits based on type
@@ -194,78 +198,105 @@ def progress_maps(window, selected, map_settings):
             if habits[habit]['type'] == "progress"
         }
     habits = dict(sorted(habits.items(), key=lambda x: x[1]['name']))
+    if not habits:
+        return None
 
-    if habits:
-        if based_on == "day":
-            day = datetime.date.today() + timedelta(days=index)
-            on = day.strftime("%Y-%m-%d")
-            try:
-                records = {habit: habits[habit]['data'][on] for habit in habits}
-            except:
-                for habit in habits:
-                    if on not in habits[habit]['data']:
-                        habits[habit]['data'][on] = 0
-                records = {habit: habits[habit]['data'][on] for habit in habits}
-        else:
-            habitid = list(habits.keys())[index % len(habits)]
-            records = habits[habitid]['data']
-            on = habits[habitid]['name']
-
-        window.addstr(6, 5, f"< {on} >", curses.color_pair(1 + (selected[0] == 3)))
-
-        max_length = max(
-            len(habits[habit]['name']) for habit in records
-        ) if based_on == "day" else 10
-        max_width = window.getmaxyx()[1] - 23 - max_length
-
-        interval = max_width // 10
-
-        records = dict(sorted(records.items()))
-
-        for i, (key, value) in enumerate(records.items()):
-            if i + 9 <= window.getmaxyx()[0] - 6:
-                if based_on == "day":
-                    habitid = key
-                    key = habits[key]['name']
-                    target = habits[habitid]['target_value']
-                else:
-                    habitid = list(habits.keys())[index % len(habits)]
-                    if habits[habitid]['type'] == "progress":
-                        target = habits[habitid]['target_value']
-                    else:  # for frequency tasks, use the maximum value in the displayed data
-                        target = max(*records.values(), 1)
-
-                for x in range(interval + 1):
-                    if based_on == "day" or habits[habitid]['type'] == "progress":
-                        window.addstr(
-                            8, 7 + max_length + round(max_width * (x / interval)),
-                            str(round(x / interval * 100)).rjust(2)
-                        )
-                    else:
-                        window.addstr(
-                            8, 7 + max_length + round(max_width * (x / interval)),
-                            f'{float(f"{x / interval * target:.2g}"):g}'.rjust(2)
-                        )
+    if based_on == "day":
+        day = datetime.date.today() + timedelta(days=index)
+        on = day.strftime("%Y-%m-%d")
+        records = {habit: habits[habit]['data'].get(on, 0) for habit in habits}
+    else:
+        habitid = list(habits.keys())[index % len(habits)]
+        records = get_daily_records(habits[habitid])
+        on = habits[habitid]['name']
 
-                window.addstr(
-                    9 + i, 5,
-                    key.rjust(max_length), curses.color_pair(1 + (selected[0] == i + 4))
-                )
-                window.addstr(
-                    9 + i, 8 + max_length,
-                    " " * min(round(max_width * value / target), max_width), curses.color_pair(2)
-                )
-                if habits[habitid]['type'] == "progress":
-                    window.addstr(
-                        9 + i, window.getmaxyx()[1] - 15,
-                        f"{round(value / target * 100, 2):.2f}%".rjust(10)
+    max_length = max(
+        len(habits[habit]['name']) for habit in records
+    ) if based_on == "day" else 10
+    max_width = window.getmaxyx()[1] - 23 - max_length
+
+    interval = max_width // 10
+
+    records = dict(sorted(records.items()))
+    rollups = Habit.index("rollups")
+    if based_on == "habit":
+        habitid = list(habits.keys())[index % len(habits)]
+        # for frequency tasks, use the maximum value in the displayed data
+        target = max([*records.values(), 1])
+        max_length_values = max(len(str(value)) for value in records.values())
+
+    scale = []
+    rows = []
+    for i, (key, value) in enumerate(records.items()):
+        if i + 9 <= window.getmaxyx()[0] - 6:
+            # how much of its target the record reached, as rolled up for the heatmaps
+            if based_on == "day":
+                habitid = key
+                key = habits[key]['name']
+                fraction = rollups.day(habitid, day.toordinal())
+            else:
+                fraction = rollups.day(habitid, day_ordinal(key))
+
+            if based_on == "day" or habits[habitid]['type'] == "progress":
+                scale = [
+                    (
+                        7 + max_length + round(max_width * (x / interval)),
+                        str(round(x / interval * 100)).rjust(2)
                     )
-                else:
-                    max_length_values = max(len(str(value)) for value in records.values())
-                    window.addstr(
-                        9 + i, window.getmaxyx()[1] - 6 - max_length_values,
-                        str(value).rjust(max_length_values)
+                    for x in range(interval + 1)
+                ]
+            else:
+                scale = [
+                    (
+                        7 + max_length + round(max_width * (x / interval)),
+                        f'{float(f"{x / interval * target:.2g}"):g}'.rjust(2)
                     )
+                    for x in range(interval + 1)
+                ]
+
+            if habits[habitid]['type'] == "progress":
+                label = (
+                    window.getmaxyx()[1] - 15, f"{round(fraction * 100, 2):.2f}%".rjust(10)
+                )
+            else:
+                label = (
+                    window.getmaxyx()[1] - 6 - max_length_values,
+                    str(value).rjust(max_length_values)
+                )
+            rows.append((
+                key.rjust(max_length), " " * min(round(max_width * fraction), max_width), label
+            ))
+    return {"on": on, "max_length": max_length, "scale": scale, "rows": rows}
+
+def progress_maps(window, selected, map_settings):
+    """
+    prints a progress map, with progress bars.
+    """
+    display_borders(window, selected)
+    based_on = ["day", "habit"][map_settings['based_on'] % 2]
+    index = map_settings['index']
+
+    window.addstr(2, 5, "progress habits")
+
+    window.addstr(4, 5, "based on: ")
+    window.addstr(f"< {based_on} >", curses.color_pair(1 + (selected[0] == 2)))
+
+    layout = cached_layout(
+        "habits/progress",
+        (based_on, index, today_ordinal(), Habit.version(), window.getmaxyx()),
+        lambda: progress_layout(window, based_on, index)
+    )
+
+    if layout:
+        window.addstr(6, 5, f"< {layout['on']} >", curses.color_pair(1 + (selected[0] == 3)))
+
+        for x, percent in layout["scale"]:
+            window.addstr(8, x, percent)
+
+        for i, (name, bar_text, (x, value)) in enumerate(layout["rows"]):
+            window.addstr(9 + i, 5, name, curses.color_pair(1 + (selected[0] == i + 4)))
+            window.addstr(9 + i, 8 + layout["max_length"], bar_text, curses.color_pair(2))
+            window.addstr(9 + i, x, value)
     else:
         window.addstr(8, 5, "no progress habits!")
 
@@ -273,8 +304,8 @@ def get_sunday(this_date):
     """
     returns the sunday of the week.
     """
-    this_date = dt.strptime(this_date, "%Y-%m-%d")
-    return (this_date - timedelta(days=this_date.weekday() + 1)).strftime("%Y-%m-%d")
+    ordinal = day_ordinal(this_date)
+    return ordinal_day(ordinal - (ordinal - 1) % 7 - 1)
 
 def get_bounds(based_on, index, index2):
     """
@@ -323,6 +354,106 @@ def get_dates(start_day, end_day, based_on):
         dates = [start_day.replace(year=start_day.year + i) for i in range(length)]
     return dates
 
+def heatmap_layout(based_on, index, index2):
+    """
+    returns what a heatmap shows that doesn't depend on the selection, or None if there are
+    no habits: the bounds (or year and habit) it shows, the headers along its side, and its
+    column headers and cells as (y, x, text, column, row), with row None for the headers.
+    """
+    habits = Habit.load_habits()
+    habits = dict(sorted(habits.items(), key=lambda x: x[1]['name']))
+    if not habits:
+        return None
+
+    # the bounds
+    if based_on != "calendar":
+        start_day, end_day = get_bounds(based_on, index, index2)
+        bounds = [("start: ", start_day), ("end: ", end_day)]
+    else:
+        year = datetime.date.today().year + index
+        start_day = f"{year}-01-01"
+        end_day = f"{year}-12-31"
+
+        habit = list(habits.keys())[index2 % len(habits)]
+        bounds = [("year: ", year), ("habit: ", habits[habit]['name'])]
+
+    # the daily intensity of each habit, rolled up into the periods of the heatmap
+    rollups = Habit.index("rollups")
+    start_day = parse_day(start_day)
+    end_day = parse_day(end_day)
+
+    # define shades:
+    shades = [" ", "░", "▒", "▓", "█"]
+
+    # the side headers with the row of the selection they stand for, and the cells
+    cells = []
+    if based_on != "calendar":
+        max_length = max(len(habits[habit]['name']) for habit in habits)
+        date_headers = ["yy", "mm", "dd"]
+        if based_on == "year":
+            date_headers = ["yy"]
+        elif based_on == "month":
+            date_headers = ["yy", "mm"]
+        rows = sorted(habits)
+        side_headers = date_headers + [habits[habit]['name'] for habit in rows]
+        side = [
+            (habit.rjust(max_length), i + 2 if i >= 3 else None)
+            for i, habit in enumerate(side_headers)
+        ]
+
+        # the squares
+        periods = get_dates(start_day, end_day, based_on)
+        buckets = {habit: rollups.buckets(habit, based_on, periods, end_day) for habit in rows}
+        dates = [this_date.isoformat() for this_date in periods]
+        columns = len(dates)
+
+        for n, day in enumerate(dates):
+            day_list = day[2:].split("-")[:len(date_headers)]
+            for d, date_header in enumerate(day_list):
+                # only print if different from last round
+                if date_header != dates[n-1][2:].split("-")[:len(date_headers)][d] or n == 0:
+                    cells.append(
+                        (10 + d, 6 + max_length + n * 2, date_header.rjust(2, "0"), n, None)
+                    )
+            for i, habit in enumerate(rows):
+                value = buckets[habit][n]
+                cells.append((
+                    10 + len(date_headers) + i, 6 + max_length + n * 2,
+                    shades[min(round(value * 4), 4)] * 2, n, i
+                ))
+    else:
+        side_headers = ["mm", "dd", "sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+        side = [
+            (day.rjust(3), i + 3 if i >= 2 else None) for i, day in enumerate(side_headers)
+        ]
+
+        first_day = day_ordinal(f"{year}-01-01")
+        year_length = day_ordinal(f"{year}-12-31") - first_day + 1
+        columns = (
+            day_ordinal(get_sunday(f"{year}-12-31")) - day_ordinal(get_sunday(f"{year}-01-01"))
+        ) // 7 + 1
+
+        first_sunday = get_sunday(start_day.isoformat())
+        cells.append((10, 9, first_sunday[5:7], 0, None))
+        cells.append((11, 9, first_sunday[8:10], 0, None))
+
+        for day in range(0, year_length):
+            ordinal = first_day + day
+            weekday = ordinal % 7  # sunday is 0
+            weeks = math.ceil((day - (first_day - 1) % 7 - 5) / 7)
+            if weekday == 0:
+                this_date = datetime.date.fromordinal(ordinal)
+                if this_date.month != datetime.date.fromordinal(ordinal - 7).month:
+                    cells.append(
+                        (10, 9 + weeks * 2, str(this_date.month).rjust(2, "0"), weeks, None)
+                    )
+                cells.append((11, 9 + weeks * 2, str(this_date.day).rjust(2, "0"), weeks, None))
+            value = rollups.day(habit, ordinal)
+            cells.append((
+                12 + weekday, 9 + weeks * 2, shades[min(round(value * 4), 4)] * 2, weeks, weekday
+            ))
+    return {"bounds": bounds, "side": side, "columns": columns, "cells": cells}
+
 def heatmaps(window, selected, map_settings):
     """
     prints heatmap.
@@ -338,211 +469,38 @@ def heatmaps(window, selected, map_settings):
     window.addstr(4, 5, "based on: ")
     window.addstr(f"< {based_on} >", curses.color_pair(1 + (selected[0] == 2)))
 
-    habits = Habit.load_habits()
-    habits = dict(sorted(habits.items(), key=lambda x: x[1]['name']))
+    layout = cached_layout(
+        "habits/heatmap",
+        (based_on, index, index2, today_ordinal(), Habit.version(), window.getmaxyx()),
+        lambda: heatmap_layout(based_on, index, index2)
+    )
 
-    if habits:
+    if layout:
         # print the bounds
-        if based_on != "calendar":
-            start_day, end_day = get_bounds(based_on, index, index2)
-
-            window.addstr(6, 5, "start: ")
-            window.addstr(f"< {start_day} >", curses.color_pair(1 + (selected[0] == 3)))
-            window.addstr(8, 5, "end: ")
-            window.addstr(f"< {end_day} >", curses.color_pair(1 + (selected[0] == 4)))
-        else:
-            year = datetime.date.today().year + index
-            start_day = f"{year}-01-01"
-            end_day = f"{year}-12-31"
-
-            habit = list(habits.keys())[index2 % len(habits)]
-
-            window.addstr(6, 5, "year: ")
-            window.addstr(f"< {year} >", curses.color_pair(1 + (selected[0] == 3)))
-
-            window.addstr(8, 5, "habit: ")
-            window.addstr(f"< {habits[habit]['name']} >", curses.color_pair(1 + (selected[0] == 4)))
-
-        # reformat the information based on the bounds
-        heat = {}
-        for habit in habits:
-            heat[habit] = {}
-            if habits[habit]['type'] == "duration":
-                for record in habits[habit]['data']:
-                    record = [dt.strptime(r, "%Y-%m-%d-%H:%M") for r in record]
-                    duration = (record[1] - record[0]) / timedelta(hours=1)
-                    target_value = habits[habit]['target_value']
-                    try:
-                        heat[habit][record[0].date()] += duration / target_value
-                    except:
-                        heat[habit][record[0].date()] = duration / target_value
-            elif habits[habit]['type'] == "progress":
-                for d in habits[habit]['data']:
-                    heat[habit][
-                        dt.strptime(d, "%Y-%m-%d").date()
-                    ] = habits[habit]['data'][d] / habits[habit]['target_value']
-            elif habits[habit]['type'] == "frequency":
-                max_frequency = max(*habits[habit]['data'].values(), 1)
-                for d in habits[habit]['data']:
-                    heat[habit][
-                        dt.strptime(d, "%Y-%m-%d").date()
-                    ] = habits[habit]['data'][d] / max_frequency
-
-        start_day = dt.strptime(start_day, "%Y-%m-%d").date()
-        end_day = dt.strptime(end_day, "%Y-%m-%d").date()
-
-        # condense the information into time blocks
-        if based_on in ["day", "calendar"]:
-            condensed = {
-                habit: {
-                    day: heat[habit][day] for day in heat[habit] if start_day <= day <= end_day
-                } for habit in heat
-            }
-        elif based_on in ["week", "month", "year"]:
-            condensed = {}
-            for habit in heat:
-                condensed[habit] = {}
-                for og_date in heat[habit]:
-                    if og_date < start_day or og_date > end_day:
-                        continue
-                    if based_on == "week":
-                        rounded_date = get_sunday(dt.strftime(og_date, "%Y-%m-%d"))
-                    elif based_on == "month":
-                        rounded_date = dt.strftime(og_date, "%Y-%m-%d")[:7] + "-01"
-                    else:
-                        rounded_date = dt.strftime(og_date, "%Y-%m-%d")[:4] + "-01-01"
-                    try:
-                        condensed[habit][rounded_date] += heat[habit][og_date]
-                    except:
-                        condensed[habit][rounded_date] = heat[habit][og_date]
-                if based_on == "day":
-                    length_of_period = 1
-                elif based_on == "week":
-                    length_of_period = 7
-                elif based_on == "month":
-                    length_of_period = calendar.monthrange(
-                        int(rounded_date[:4]), int(rounded_date[5:7])
-                    )[1]
-                else:
-                    length_of_period = 365
-                for rounded_date in condensed[habit]:
-                    condensed[habit][rounded_date] /= length_of_period
-        condensed = dict(sorted(condensed.items(), key=lambda x: x[0]))
-
-        # print the heatmaps
-        if based_on != "calendar":
-            # print side
-            max_length = max(len(habits[habit]['name']) for habit in condensed)
-            date_headers = ["yy", "mm", "dd"]
-            if based_on == "year":
-                date_headers = ["yy"]
-            elif based_on == "month":
-                date_headers = ["yy", "mm"]
-            side_headers = date_headers + [habits[habit]['name'] for habit in condensed.keys()]
-            for i, habit in enumerate(side_headers):
-                window.addstr(
-                    10 + i, 5,
-                    habit.rjust(max_length),
-                    curses.color_pair(1 + (selected[0] == i + 2 if i >= 3 else 0))
-                )
-
-            # define shades:
-            shades = [" ", "░", "▒", "▓", "█"]
-
-            # print squares
-            dates = get_dates(start_day, end_day, based_on)
-            dates = [this_date.strftime("%Y-%m-%d") for this_date in dates]
-
-            selected_col = selected[1] % (len(dates))
-            for n, day in enumerate(dates):
-                day_list = day[2:].split("-")[:len(date_headers)]
-                for d, date_header in enumerate(day_list):
-                    # only print if different from last round
-                    if date_header != dates[n-1][2:].split("-")[:len(date_headers)][d] or n == 0:
-                        window.addstr(
-                            10 + d, 6 + max_length + n * 2,
-                            date_header.rjust(2, "0"),
-                            curses.color_pair(2 if selected_col == n and selected[0] >= 5 else 1)
-                        )
-                for i, habit in enumerate(condensed):
-                    try:
-                        value = condensed[habit][dt.strptime(day, "%Y-%m-%d").date()]
-                    except:
-                        value = 0
-                    this_cell_selected = selected[0] == i + 5 and selected_col == n
-                    window.addstr(
-                        10 + len(date_headers) + i, 6 + max_length + n * 2,
-                        shades[min(round(value * 4), 4)] * 2,
-                        curses.color_pair(8 if this_cell_selected else 1)
-                    )
-        else:
-            side_headers = ["mm", "dd", "sun", "mon", "tue", "wed", "thu", "fri", "sat"]
-            for i, day in enumerate(side_headers):
-                window.addstr(
-                    10 + i, 5, day.rjust(3),
-                    curses.color_pair(1 + (selected[0] == i + 3 if i >= 2 else 0))
-                )
-
-            habit = list(habits.keys())[index2 % len(habits)]
-            shades = [" ", "░", "▒", "▓", "█"]
-
-            year_length = datetime.date(year, 12, 31).timetuple().tm_yday
-            year_length_in_weeks = (
-                dt.strptime(
-                    get_sunday(f"{year}-12-31"), "%Y-%m-%d"
-                ) - dt.strptime(
-                    get_sunday(f"{year}-01-01"), "%Y-%m-%d"
-                )
-            ) // timedelta(weeks=1) + 1
-            selected_col = selected[1] % (year_length_in_weeks)
-
-            window.addstr(
-                10, 9,
-                get_sunday(dt.strftime(start_day, "%Y-%m-%d"))[5:7],
-                curses.color_pair(2 if selected_col == 0 and selected[0] >= 5 else 1)
-            )
-            window.addstr(
-                11, 9,
-                get_sunday(dt.strftime(start_day, "%Y-%m-%d"))[8:10],
-                curses.color_pair(2 if selected_col == 0 and selected[0] >= 5 else 1)
-            )
-
-            for day in range(0, year_length):
-                this_date = datetime.date(year, 1, 1) + timedelta(days=day)
-                weekday = (this_date.weekday() + 1) % 7
-                weeks = math.ceil((day - datetime.date(year, 1, 1).weekday() - 5) / 7)
-                if weekday == 0:
-                    if this_date.month != (this_date - timedelta(days=7)).month:
-                        window.addstr(
-                            10, 9 + weeks * 2,
-                            str(this_date.month).rjust(2, "0"),
-                            curses.color_pair(
-                                2 if selected_col == weeks and selected[0] >= 5 else 1
-                            )
-                        )
-                    window.addstr(
-                        11, 9 + weeks * 2,
-                        str(this_date.day).rjust(2, "0"),
-                        curses.color_pair(2 if selected_col == weeks and selected[0] >= 5 else 1)
-                    )
-                try:
-                    value = heat[habit][this_date]
-                except:
-                    value = 0
-                this_cell_selected = selected[0] == weekday + 5 and selected_col == weeks
-                window.addstr(
-                    12 + weekday, 9 + weeks * 2,
-                    shades[min(round(value * 4), 4)] * 2,
-                    curses.color_pair(8 if this_cell_selected else 1)
-                )
+        for i, (label, value) in enumerate(layout["bounds"]):
+            window.addstr(6 + i * 2, 5, label)
+            window.addstr(f"< {value} >", curses.color_pair(1 + (selected[0] == i + 3)))
+
+        # print side
+        for i, (header, row) in enumerate(layout["side"]):
+            window.addstr(10 + i, 5, header, curses.color_pair(1 + (selected[0] == row)))
+
+        # print the squares, with the selected column and cell highlighted
+        selected_col = selected[1] % layout["columns"]
+        for y, x, text, column, row in layout["cells"]:
+            if row is None:
+                color = 2 if selected_col == column and selected[0] >= 5 else 1
+            else:
+                color = 8 if selected[0] == row + 5 and selected_col == column else 1
+            window.addstr(y, x, text, curses.color_pair(color))
     else:
         window.addstr(8, 5, "no habits!")
 
-def manage_habits(window, selected, removing):
+def manage_layout():
     """
-    prints a habit management menu.
+    returns what the habit management menu shows that doesn't depend on the selection: the
+    widths of the columns, and the cells of each habit.
     """
-    display_borders(window, selected)
     habits = Habit.load_habits()
     habits = dict(sorted(habits.items(), key=lambda x: x[0]))
 
@@ -550,11 +508,34 @@ def manage_habits(window, selected, removing):
     column_widths = []
     for key in headers:
         try:
-            column_widths.append(max(len(str(habits[habit][key])) for habit in habits))
+            column_widths.append(
+                max(len(str(habits[habit][key.replace(" ", "_")])) for habit in habits)
+            )
         except:
             column_widths.append(0)
     column_widths = [max(column_widths[i], len(headers[i])) + 3 for i in range(len(headers))]
 
+    rows = []
+    for habit in habits:
+        items = []
+        for i, header in enumerate(headers):
+            item = str(habits[habit][header.replace(" ", "_")])
+            if i == 3 and habits[habit]["type"] == "frequency":
+                item = ""
+            items.append(item.ljust(column_widths[i] - 2))
+        rows.append((habit, items))
+    return {"headers": headers, "column_widths": column_widths, "rows": rows}
+
+def manage_habits(window, selected, removing):
+    """
+    prints a habit management menu.
+    """
+    display_borders(window, selected)
+    layout = cached_layout(
+        "habits/manage", (Habit.version(), window.getmaxyx()), manage_layout
+    )
+    headers, column_widths, rows = layout["headers"], layout["column_widths"], layout["rows"]
+
     window.addstr(2, 5, "manage habits")
 
     for i, header in enumerate(headers):
@@ -575,7 +556,7 @@ def manage_habits(window, selected, removing):
         )
         # draw the bottom border of the table
         window.addstr(
-            min(7 + len(habits), window.getmaxyx()[0] - 6),
+            min(7 + len(rows), window.getmaxyx()[0] - 6),
             5 + sum(column_widths[:i]) + i,
             ('╚' if i == 0 else "╩") + '═' * column_widths[i]
         )
@@ -587,17 +568,14 @@ def manage_habits(window, selected, removing):
             '║' if row % 2 else ('╗' if row == 0 else '╣')
         )
     window.addstr(
-        min(7 + len(habits), window.getmaxyx()[0] - 6),
+        min(7 + len(rows), window.getmaxyx()[0] - 6),
         5 + sum(column_widths) + len(column_widths),
         '╝'
     )
 
-    for h, habit in enumerate(habits):
+    for h, (habit, items) in enumerate(rows):
         if h + 7 <= window.getmaxyx()[0] - 7:
-            for i, header in enumerate(headers):
-                item = str(habits[habit][header])
-                if i == 3 and habits[habit]["type"] == "frequency":
-                    item = ""
+            for i, item in enumerate(items):
                 # draw cell contents
                 window.addstr(
                     7 + h, 5 + sum(column_widths[:i]) + i,
@@ -606,12 +584,12 @@ def manage_habits(window, selected, removing):
                 if removing == habit:
                     window.addstr(
                         7 + h, 7 + sum(column_widths[:i]) + i,
-                        item.ljust(column_widths[i] - 2), curses.color_pair(7)
+                        item, curses.color_pair(7)
                     )
                 else:
                     window.addstr(
                         7 + h, 7 + sum(column_widths[:i]) + i,
-                        item.ljust(column_widths[i] - 2),
+                        item,
                         curses.color_pair(1 + (selected[0] == h + 2 and selected[1] % 4 == i))
                     )
             # draw the right cell border
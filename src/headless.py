@@ -0,0 +1,56 @@
+import curses
+
+from canvas import Canvas
+
+def color_pair(number):
+    """return the attribute of a color pair, the way curses lays it out."""
+    return number << 8
+
+def install():
+    """
+    let the views run without a terminal: curses only hands out color pairs once the
+    screen is set up, which a fake window never does.
+    """
+    curses.color_pair = color_pair
+
+class FakeWindow(Canvas):
+    """
+    a canvas without a window behind it, which records the addstr, insstr and chgat calls
+    made on it, so that views can be drawn without a terminal.
+    """
+
+    def __init__(self, height, width):
+        self.calls = []
+        super().__init__(None, (height, width))
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, *args):
+        self.calls.append(("addstr", *args))
+        super().addstr(*args)
+
+    def insstr(self, *args):
+        self.calls.append(("insstr", *args))
+        super().insstr(*args)
+
+    def chgat(self, *args):
+        self.calls.append(("chgat", *args))
+        super().chgat(*args)
+
+    def erase(self):
+        super().erase()
+        self.calls = []
+
+    def clear(self):
+        self.erase()
+
+    def touchwin(self):
+        pass
+
+    def refresh(self):
+        pass
+
+    def text(self):
+        """return what the window shows, one line per row."""
+        return "\n".join("".join(self.render(y)[0]).rstrip() for y in range(self.height))
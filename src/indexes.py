@@ -0,0 +1,417 @@
+import bisect
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from dates import day_ordinal, Timestamps
+
+class Index(ABC):
+    """
+    base class for the indexes kept over the items of a store. an index is updated with
+    every change made through the app, and only built again from scratch when the items
+    changed some other way (e.g. they were read again after another process wrote them).
+    """
+
+    def __init__(self):
+        self.version = None  # version of the store the index is in sync with
+        self.ranks = {}  # order in which the items were added, to break ties when sorting
+        self.next_rank = 0
+
+    def sync(self, items, version):
+        """build the index again if the items changed since it was last updated."""
+        if version != self.version:
+            self.ranks = {item_id: rank for rank, item_id in enumerate(items)}
+            self.next_rank = len(items)
+            self.build(items)
+            self.version = version
+        return self
+
+    def apply(self, items, item_id, old, version, change=None):
+        """
+        update the index for a change to one item, given the item before (None if new) and
+        the change as (op, fields) when it is known.
+        """
+        if old is None and item_id in items:
+            self.ranks[item_id] = self.next_rank
+            self.next_rank += 1
+        if change is None or not self.patch(item_id, *change):
+            self.update(items, item_id, old)
+        if item_id not in items:
+            self.ranks.pop(item_id, None)
+        self.version = version
+
+    @abstractmethod
+    def build(self, items):
+        """index the items from scratch."""
+
+    @abstractmethod
+    def update(self, items, item_id, old):
+        """update the index for a change to one item, given the item before (None if new)."""
+
+    def patch(self, _item_id, _op, _fields):
+        """
+        apply a change to the index directly, instead of updating it from the item. return
+        False if the index can't apply that change.
+        """
+        return False
+
+@contextmanager
+def changing(store, indexes, item_id, change=None):
+    """
+    update the indexes over a store with the change made to one item inside the block. the
+    change can be given as (op, fields), for the indexes that can apply it directly.
+    """
+    items = store.load()
+    for index in indexes:
+        index.sync(items, store.version)
+    old = dict(items[item_id]) if item_id in items else None
+    version = store.version
+    yield
+    # anything else that changed in the meantime means the indexes have to be rebuilt
+    if store.version == version + 1:
+        for index in indexes:
+            index.apply(store.load(), item_id, old, store.version, change)
+
+def due_ordinal(task):
+    """return the due date of a task as a day number, 0 if it has none."""
+    try:
+        return day_ordinal(task['due_date'])
+    except (TypeError, ValueError):
+        return 0
+
+def task_sort_key(task, rank):
+    """sort unfinished tasks first, then the latest due date first, then the oldest task."""
+    return (int(task['completed']), -due_ordinal(task), rank)
+
+class TaskTree(Index):
+    """
+    the tasks as a tree: the subtasks of each task, the root tasks sorted the way the
+    list view shows them (unfinished first, then latest due date first), and the
+    flattened list view with the row of each task. for hiding completed tasks, it also
+    counts the tasks in each subtree and how many of them are completed.
+    """
+
+    # fields that change where tasks are shown in the list view
+    fields = ("parent", "subtasks", "completed", "due_date")
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = {}
+        self.children = {}  # the subtasks of each task
+        self.roots = []  # the tasks without a parent, in the order of the list view
+        self.root_keys = []  # the sort keys of the roots, to bisect them
+        self.flattened = {}  # flattened list views, by hide_completed
+        self.parents = {}  # the task that lists each task as a subtask
+        self.done, self.total = {}, {}  # completed and total number of tasks in each subtree
+
+    def build(self, items):
+        self.tasks = items
+        self.children = {task_id: list(task['subtasks']) for task_id, task in items.items()}
+        self.roots = sorted(
+            (task_id for task_id in items if not items[task_id]['parent']),
+            key=lambda task_id: self.root_key(task_id, items[task_id])
+        )
+        self.root_keys = [self.root_key(task_id, items[task_id]) for task_id in self.roots]
+        self.flattened = {}
+
+        self.parents = {}
+        for task_id in items:
+            for subtask_id in self.children[task_id]:
+                if subtask_id in items:
+                    self.parents[subtask_id] = task_id
+
+        # the subtrees are counted bottom-up
+        self.done, self.total = {}, {}
+        visiting = set()
+        for task_id in items:
+            stack = [(task_id, False)]
+            while stack:
+                current, counted = stack.pop()
+                subtasks = [
+                    subtask_id for subtask_id in self.children[current] if subtask_id in items
+                ]
+                if counted:
+                    self.done[current] = int(bool(items[current]['completed'])) + sum(
+                        self.done.get(subtask_id, 0) for subtask_id in subtasks
+                    )
+                    self.total[current] = 1 + sum(
+                        self.total.get(subtask_id, 0) for subtask_id in subtasks
+                    )
+                elif current not in self.total and current not in visiting:
+                    visiting.add(current)  # a task that is its own subtask is counted once
+                    stack.append((current, True))
+                    stack.extend((subtask_id, False) for subtask_id in subtasks)
+
+    def root_key(self, task_id, task):
+        return task_sort_key(task, self.ranks[task_id])
+
+    def update(self, items, item_id, old):
+        self.tasks = items
+        new = items.get(item_id)
+        if old is None and new is None:
+            return
+        if old is not None and new is not None and all(
+            old.get(field) == new.get(field) for field in self.fields
+        ):
+            return  # e.g. a new name, which does not move the task
+
+        if old is not None and not old['parent']:
+            i = bisect.bisect_left(self.root_keys, self.root_key(item_id, old))
+            del self.roots[i], self.root_keys[i]
+
+        if new is None:
+            del self.children[item_id]
+            parent_id = self.parents.pop(item_id, None)
+            if parent_id is not None:
+                self.count(parent_id, -self.done[item_id], -self.total[item_id])
+            for subtask_id in old['subtasks']:
+                if self.parents.get(subtask_id) == item_id:
+                    del self.parents[subtask_id]
+            del self.done[item_id], self.total[item_id]
+        else:
+            self.children[item_id] = list(new['subtasks'])
+            if not new['parent']:
+                key = self.root_key(item_id, new)
+                i = bisect.bisect_right(self.root_keys, key)
+                self.roots.insert(i, item_id)
+                self.root_keys.insert(i, key)
+
+            if old is None:
+                self.done[item_id], self.total[item_id] = 0, 1
+            old_subtasks = set(old['subtasks']) if old is not None else set()
+            new_subtasks = set(new['subtasks'])
+            for subtask_id in old_subtasks - new_subtasks:
+                if subtask_id in self.total:
+                    if self.parents.get(subtask_id) == item_id:
+                        del self.parents[subtask_id]
+                    self.count(item_id, -self.done[subtask_id], -self.total[subtask_id])
+            for subtask_id in new_subtasks - old_subtasks:
+                if subtask_id in self.total:
+                    self.parents[subtask_id] = item_id
+                    self.count(item_id, self.done[subtask_id], self.total[subtask_id])
+            completed = int(bool(new['completed']))
+            if old is not None:
+                completed -= int(bool(old['completed']))
+            if completed:
+                self.count(item_id, completed, 0)
+        self.flattened = {}
+
+    def count(self, task_id, done, total):
+        """add to the counts of a subtree and of all the subtrees it is part of."""
+        seen = set()
+        while task_id is not None and task_id not in seen:
+            seen.add(task_id)
+            self.done[task_id] += done
+            self.total[task_id] += total
+            task_id = self.parents.get(task_id)
+
+    def subtree_completed(self, task_id):
+        """check if the task and all its subtasks are completed."""
+        return self.done[task_id] == self.total[task_id]
+
+    def flatten(self, hide_completed):
+        """
+        return the list view as (task ids, rows, depths). completed root tasks are hidden
+        when their subtasks are completed as well, completed subtasks are always hidden.
+        """
+        if hide_completed not in self.flattened:
+            order, depths = [], {}
+            stack = [
+                (task_id, 0) for task_id in reversed(self.roots)
+                if not (hide_completed and self.subtree_completed(task_id))
+            ]
+            while stack:
+                task_id, depth = stack.pop()
+                if task_id in depths:
+                    continue  # listed as a subtask twice
+                order.append(task_id)
+                depths[task_id] = depth
+                stack.extend(
+                    (subtask_id, depth + 1) for subtask_id in reversed(self.children[task_id])
+                    if subtask_id in self.tasks
+                    and not (hide_completed and self.tasks[subtask_id]['completed'])
+                )
+            rows = {task_id: row for row, task_id in enumerate(order)}
+            self.flattened[hide_completed] = (order, rows, depths)
+        return self.flattened[hide_completed]
+
+    def order(self, hide_completed=False):
+        """return the task ids in the order of the list view (shared, do not modify)."""
+        return self.flatten(hide_completed)[0]
+
+    def position(self, task_id, hide_completed=False):
+        """return the row of a task in the list view."""
+        return self.flatten(hide_completed)[1][task_id]
+
+    def depth(self, task_id, hide_completed=False):
+        """return how deep a task is nested in the list view."""
+        return self.flatten(hide_completed)[2][task_id]
+
+def task_days(task):
+    """
+    return the days a task is shown on, as day numbers: when it is due, added, and migrated to.
+    """
+    history = task['date_history']
+    days = {task['due_date'], task['date_added']} | {
+        history[i][1] for i in range(len(history) - 1) if history[i][1] == history[i + 1][0]
+    }
+    ordinals = set()
+    for day in days:
+        try:
+            ordinals.add(day_ordinal(day))
+        except (TypeError, ValueError):
+            pass  # no date, or not a date
+    return ordinals
+
+class DateIndex(Index):
+    """
+    the tasks shown on each day (see task_days), with the days kept sorted so that a range
+    of days can be looked up without going through every day in it.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.tasks = {}
+        self.days = {}  # day number -> ids of the tasks shown on it
+        self.sorted_days = []
+
+    def build(self, items):
+        self.tasks = items
+        self.days = {}
+        self.sorted_days = []
+        for task_id, task in items.items():
+            self.add(task_id, task_days(task))
+
+    def add(self, task_id, days):
+        for day in days:
+            if day not in self.days:
+                self.days[day] = set()
+                bisect.insort(self.sorted_days, day)
+            self.days[day].add(task_id)
+
+    def remove(self, task_id, days):
+        for day in days:
+            self.days[day].discard(task_id)
+            if not self.days[day]:
+                del self.days[day]
+                del self.sorted_days[bisect.bisect_left(self.sorted_days, day)]
+
+    def update(self, items, item_id, old):
+        self.tasks = items
+        old_days = task_days(old) if old is not None else set()
+        new_days = task_days(items[item_id]) if item_id in items else set()
+        self.remove(item_id, old_days - new_days)
+        self.add(item_id, new_days - old_days)
+
+    def between(self, start, end):
+        """
+        return the ids of the tasks shown from start to end (both yyyy-mm-dd), sorted. tasks
+        that sort the same are kept in the order of the first day they are shown on.
+        """
+        first_days = {}  # task id -> the first day in the range the task is shown on
+        first = bisect.bisect_left(self.sorted_days, day_ordinal(start))
+        last = bisect.bisect_right(self.sorted_days, day_ordinal(end))
+        for day in self.sorted_days[first:last]:
+            for task_id in self.days[day]:
+                first_days.setdefault(task_id, day)
+
+        def key(task_id):
+            completed, due, rank = task_sort_key(self.tasks[task_id], self.ranks[task_id])
+            return completed, due, first_days[task_id], rank
+
+        return sorted(first_days, key=key)
+
+class SessionIndex(Index):
+    """
+    the sessions of each duration habit as arrays of start and end times in minutes,
+    sorted by start time, so that the sessions in a time range are found with a bisect
+    instead of parsing every session.
+    """
+
+    def __init__(self, timestamps=None):
+        super().__init__()
+        self.starts, self.ends, self.sessions = {}, {}, {}
+        self.longest = {}  # length of the longest session of each habit
+        self.timestamps = timestamps or Timestamps()  # can be shared with other indexes
+
+    def build(self, items):
+        self.starts, self.ends, self.sessions = {}, {}, {}
+        self.longest = {}
+        with self.timestamps.building():
+            for habit_id, habit in items.items():
+                self.add(habit_id, habit)
+
+    def add(self, habit_id, habit):
+        for arrays in (self.starts, self.ends, self.sessions, self.longest):
+            arrays.pop(habit_id, None)
+        if habit['type'] != "duration" or not isinstance(habit['data'], list):
+            return
+        minute = self.timestamps.minute
+        sessions = sorted(habit['data'], key=lambda session: minute(session[0]))
+        self.sessions[habit_id] = sessions
+        self.starts[habit_id] = [minute(session[0]) for session in sessions]
+        self.ends[habit_id] = [minute(session[1]) for session in sessions]
+        self.longest[habit_id] = max(
+            (end - start for start, end in zip(self.starts[habit_id], self.ends[habit_id])),
+            default=0
+        )
+
+    def update(self, items, item_id, old):
+        # records can be changed in place, so the habit is indexed again from its data. its
+        # timestamps were already converted, and the data is already sorted.
+        self.add(item_id, items.get(item_id, {"type": None, "data": None}))
+
+    def patch(self, item_id, op, fields):
+        if item_id not in self.starts:
+            return False
+        starts, ends, sessions = self.starts[item_id], self.ends[item_id], self.sessions[item_id]
+        match op:
+            case "add_sessions":
+                for session in fields:
+                    start = self.timestamps.minute(session[0])
+                    end = self.timestamps.minute(session[1])
+                    i = bisect.bisect_right(starts, start)
+                    starts.insert(i, start)
+                    ends.insert(i, end)
+                    sessions.insert(i, session)
+                    self.longest[item_id] = max(self.longest[item_id], end - start)
+                return True
+            case "remove_session":
+                start = self.timestamps.minute(fields[0])
+                i = bisect.bisect_left(starts, start)
+                while i < len(starts) and starts[i] == start and sessions[i] != fields:
+                    i += 1
+                if i == len(starts) or starts[i] != start:
+                    return False
+                length = ends[i] - starts[i]
+                del starts[i], ends[i], sessions[i]
+                if length == self.longest[item_id]:
+                    self.longest[item_id] = max(
+                        (end - start for start, end in zip(starts, ends)), default=0
+                    )
+                return True
+        return False
+
+    def starting(self, habit_id, start, end):
+        """return the sessions of a habit that start from minute start up to (not incl.) end."""
+        starts = self.starts.get(habit_id, [])
+        first = bisect.bisect_left(starts, start)
+        last = bisect.bisect_left(starts, end)
+        return self.sessions[habit_id][first:last] if last > first else []
+
+    def overlapping(self, habit_id, start, end):
+        """return the sessions of a habit that overlap minute start up to (not incl.) end."""
+        if habit_id not in self.starts:
+            return []
+        starts, ends = self.starts[habit_id], self.ends[habit_id]
+        first = bisect.bisect_left(starts, start - self.longest[habit_id])
+        last = bisect.bisect_left(starts, end)
+        return [
+            self.sessions[habit_id][i] for i in range(first, last)
+            if ends[i] > start or starts[i] >= start
+        ]
+
+    def on_day(self, habit_id, day):
+        """return the sessions of a habit that start on a day (yyyy-mm-dd)."""
+        start = day_ordinal(day) * 1440
+        return self.starting(habit_id, start, start + 1440)
@@ -0,0 +1,288 @@
+import curses
+import json
+import math
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from datetime import date, datetime as dt, timedelta
+
+from storage import io_counts
+from dates import cache_misses
+from modules import Task, Habit
+from misc import center_string, debug_overlay, splash_screen
+from canvas import Canvas
+from options import option
+
+# how long the main loop waits for input before waking up, in milliseconds
+ANIMATION_TIMEOUT = 20  # while something on screen is animated
+IDLE_TIMEOUT = 1000  # otherwise, to check if the data files were changed by another process
+
+USAGE = "usage: dots [-n | --no-home-screen] [--stats] [--trace FILE] | dots --import-json"
+
+def read_keys(window):
+    """
+    wait for a key (as long as the timeout of the window), and return it together with the
+    keys that are already queued behind it, or an empty list if none was pressed. the window
+    is left in no-delay mode, the main loop sets its timeout before each wait.
+    """
+    keys = []
+    key = window.getch()
+    window.timeout(0)
+    while key != -1:
+        keys.append(key)
+        key = window.getch()
+    return keys
+
+class Wakeups:
+    """
+    counts how often the main loop wakes up, and how many of those wakeups were idle
+    (i.e. the wait for input timed out).
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.total = 0
+        self.idle = 0
+        self.redraws = 0
+
+    def record(self, key, redraw):
+        """record a wakeup of the main loop."""
+        self.total += 1
+        self.idle += key == -1
+        self.redraws += bool(redraw)
+
+    def idle_rate(self):
+        """return the number of idle wakeups per second."""
+        return self.idle / max(time.monotonic() - self.start, 1e-9)
+
+    def summary(self):
+        """return a summary of the wakeups."""
+        return (
+            f"{self.total} wakeups ({self.idle} idle, {self.idle_rate():.2f}/s), "
+            f"{self.redraws} redraws in {time.monotonic() - self.start:.1f}s"
+        )
+
+class FrameStats:
+    """
+    times the parts of each frame that is drawn (e.g. the content or the status bar), and
+    counts the loads and saves of the stores, the bytes they read and wrote and the date
+    strings that missed the parse caches (see cache_misses) while handling the key and
+    drawing the frame. the numbers of the last frame are shown by the debug overlay, and
+    written to a trace file (one json line per frame).
+    """
+
+    def __init__(self, trace=None):
+        self.trace = trace  # file the stats of each frame are appended to, or None
+        self.frames = 0
+        self.last = None  # stats of the last frame
+        self.key = -1
+        self.keys = 0  # keys applied since the last frame
+        self.key_time = None  # when the first of them was read
+        self.start_frame()
+
+    def counts(self):
+        return {**io_counts, "date_cache_misses": cache_misses()}
+
+    def start_frame(self):
+        """start counting for the next frame."""
+        self.timings = {}
+        self.start_counts = self.counts()
+
+    def key_pressed(self, key):
+        """
+        record a key applied by the main loop, to measure how long it takes to show. when
+        several keys are applied in a frame, it is measured from the first one.
+        """
+        if key != -1:
+            self.keys += 1
+            self.key = key
+            if self.key_time is None:
+                self.key_time = time.perf_counter()
+
+    @contextmanager
+    def timing(self, name):
+        """add the time spent inside the block to a part of the frame."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0) + time.perf_counter() - start
+
+    def end_frame(self):
+        """finish the frame once it has been painted, and write it to the trace file."""
+        self.frames += 1
+        counts = self.counts()
+        self.last = {
+            "frame": self.frames,
+            "key": self.key if self.key_time is not None else None,
+            "keys": self.keys,
+            "ms": {name: round(took * 1000, 3) for name, took in self.timings.items()},
+            **{name: counts[name] - self.start_counts[name] for name in counts},
+            "latency_ms": (
+                round((time.perf_counter() - self.key_time) * 1000, 3)
+                if self.key_time is not None else None
+            ),
+        }
+        self.key_time = None
+        self.keys = 0
+        if self.trace:
+            with open(self.trace, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(self.last) + "\n")
+        self.start_frame()
+
+    def lines(self):
+        """return the stats of the last frame as lines of text for the debug overlay."""
+        if self.last is None:
+            return []
+        last = self.last
+        lines = [f"frame {last['frame']}"]
+        lines += [f"{name}: {took:.2f} ms" for name, took in last['ms'].items()]
+        lines += [
+            f"loads: {last['loads']}  saves: {last['saves']}",
+            f"read: {last['bytes_read']} B  written: {last['bytes_written']} B",
+            f"date cache misses: {last['date_cache_misses']}",
+        ]
+        if last['latency_ms'] is not None:
+            lines.append(f"key to paint: {last['latency_ms']:.2f} ms")
+        return lines
+
+class Rollover:
+    """
+    keeps track of the local date, so that day-based state is only refreshed once at
+    startup and once at each local midnight instead of on every frame.
+    """
+
+    def __init__(self):
+        self.today = None
+
+    def due(self):
+        """check if the date changed since the last rollover (or if there was none yet)."""
+        return date.today() != self.today
+
+    def roll(self):
+        """start a new day, and return the previous date (None at startup)."""
+        previous, self.today = self.today, date.today()
+        return previous
+
+    def timeout(self):
+        """return the number of milliseconds until the next local midnight."""
+        midnight = dt.combine(self.today + timedelta(days=1), dt.min.time())
+        return max(math.ceil((midnight - dt.now()) / timedelta(milliseconds=1)), 0)
+
+class MainLoop:
+    """
+    the parts of the main loop that don't depend on the view: the windows the screen is
+    drawn into, the keys read but not applied yet, when the screen has to be drawn again,
+    and the stats of the frames and wakeups.
+    """
+
+    def __init__(self, stdscr):
+        self.stdscr = stdscr
+
+        # the screen is drawn into canvases, which only send the lines that changed
+        height, width = stdscr.getmaxyx()
+        self.screen = Canvas(stdscr)
+        self.content_window = Canvas(curses.newwin(height - 3, width, 2, 0))  # from row 2
+
+        # the screen is only drawn again after input, or when the data or animation changed
+        self.redraw = True
+        self.keys = deque()  # keys read but not applied yet
+        self.wakeups = Wakeups()
+        self.rollover = Rollover()
+
+        # timings and storage counts of each frame, shown by the debug overlay (toggled with `)
+        self.stats = FrameStats(option("--trace", None, USAGE))
+        self.overlay = False
+        self.splash_size = None  # size of the screen the home screen was laid out for
+
+    def follow_date(self, day):
+        """
+        at startup and each local midnight, start a new day. return the day to show, which
+        moves on to today if the previous day was shown.
+        """
+        if not self.rollover.due():
+            return day
+        previous_day = self.rollover.roll()
+        self.content_window.erase()
+        self.redraw = True
+        if previous_day and day == previous_day.strftime("%Y-%m-%d"):
+            return self.rollover.today.strftime("%Y-%m-%d")
+        return day
+
+    def splash(self):
+        """
+        draw the home screen. the logo is animated through color 69 alone, so it is only laid
+        out again when the size of the screen changes.
+        """
+        size = self.screen.getmaxyx()
+        if self.splash_size != size:
+            self.splash_size = None
+            splash_screen(self.screen)
+            self.splash_size = size
+
+    @contextmanager
+    def frame(self, started):
+        """
+        draw a frame inside the block (or a message if the screen is too small for it), then
+        send everything drawn in it to the terminal at once.
+        """
+        try:
+            yield
+        except curses.error:
+            try:
+                # the screen is drawn over the content window, but not cleared: only the
+                # cells that changed are sent while it stays too small
+                self.screen.erase()
+                self.screen.touchwin()
+                self.content_window.touchwin()  # painted over by the screen
+                center_string(self.screen, "hi, your screen is too small...", offset=(0, -1))
+                center_string(
+                    self.screen, "please zoom out or enlarge your window! :3", offset=(0, 1)
+                )
+            except curses.error:
+                pass
+        with self.stats.timing("refresh"):
+            self.screen.refresh()
+        if self.overlay and started:
+            try:
+                debug_overlay(self.screen, self.stats.lines())
+            except curses.error:
+                pass
+        with self.stats.timing("refresh"):
+            curses.doupdate()
+        self.stats.end_frame()
+
+    def next_key(self, started):
+        """
+        return the next key to apply, or -1 if none was pressed. once the queued keys are
+        applied, wait for key input, waking up for the next animation frame, to check the
+        data files or at midnight. the keys queued behind it (e.g. while a key is held down or
+        text is pasted) are read along with it, and all applied before the screen is drawn.
+        """
+        if not self.keys:
+            self.stdscr.timeout(
+                min(IDLE_TIMEOUT if started else ANIMATION_TIMEOUT, self.rollover.timeout())
+            )
+            self.keys.extend(read_keys(self.stdscr))
+            self.redraw = bool(self.keys) or not started
+            if not self.keys and started and (Task.store().changed() or Habit.store().changed()):
+                self.content_window.erase()  # another process changed the data
+                self.redraw = True
+            self.wakeups.record(self.keys[0] if self.keys else -1, self.redraw)
+        key = self.keys.popleft() if self.keys else -1
+        self.stats.key_pressed(key)
+        return key
+
+    def resize(self):
+        """
+        fit the content window to the screen after curses resized it (the layouts of the views
+        are built again for the new size), and paint everything again once.
+        """
+        height, width = self.stdscr.getmaxyx()
+        try:
+            self.content_window.resize(max(height - 3, 1), width)
+            self.content_window.mvwin(2, 0)  # curses moves windows off a smaller screen
+        except curses.error:
+            pass  # shown as too small on the next frame
+        self.screen.clear()
@@ -1,21 +1,18 @@
 import curses
-import time
 import re
-from datetime import datetime as dt, date, timedelta
+from datetime import date, timedelta
 import calendar
 import sys
 import os
 import toml
 
-from points import points
-
 from tasks import (
     get_task_list,
     tasks_for_day, tasks_for_week, tasks_for_month, tasks_for_year,
 )
 
 from habits import (
-    get_records_from_habits,
+    get_records_from_habits, get_daily_records,
     get_sunday, get_bounds, get_dates,
 )
 
@@ -24,25 +21,36 @@ from modules import (
     Habit, DurationHabit, FrequencyHabit, ProgressHabit,
 )
 
+from storage import import_json
+
+from loop import MainLoop
+from dates import day_ordinal, parse_day, shift_day, typed_timestamp, weekday
+
 from misc import (
     status_bar,
     edit_task_parent,
     outer_navbar, inner_options, inner_navbar,
     change_color, init_colors,
-    check_date, center_string
+    check_date,
 )
 
 from content import content
 
 config = toml.load(os.path.join(os.path.expanduser("~"), ".dots", "config.toml"))
 
+# the characters that can be typed into the text box
+TEXT_CHARACTERS = (
+    "abcdefghijklmnopqrstuvwxyz"
+    + "ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890"
+    + "!@#$%^&*()_+-=[]{}|;':,.<>/? "
+)
+
 def main(stdscr):
     """
     the main function.
     """
     # screen setup
     stdscr.clear()
-    stdscr.nodelay(1)
     stdscr.keypad(1)
     curses.curs_set(0)  # hide cursor
     curses.nonl()
@@ -53,7 +61,6 @@ def main(stdscr):
         init_colors()
 
     # initial states
-    height, width = stdscr.getmaxyx()
     started = "-n" in sys.argv or "--no-home-screen" in sys.argv
     selected = [0, -1]
     outer_option = inner_option = 0
@@ -66,83 +73,70 @@ def main(stdscr):
     hide_completed = False
     day = date.today().strftime("%Y-%m-%d")
     map_settings = {"based_on": 0, "index": 0, "index2": 0}
+    scroll = {}  # first row shown in each scrolled view
     new_habit = {"name": " ", "type": "progress", "unit": "", "target_value": 1.0}
 
-    # create a window for content
-    content_height = height - 3  # adjust based on your layout
-    content_width = width
-    content_window = curses.newwin(content_height, content_width, 2, 0)  # starting from row 2
+    # the windows, the queued keys and the stats of the frames
+    loop = MainLoop(stdscr)
+    screen, content_window = loop.screen, loop.content_window
+
+    # days without habit progress are no longer stored, drop the zero records of older versions
+    Habit.strip_empty_records()
 
     while True:
-        special_color = change_color(special_color)
+        day = loop.follow_date(day)
 
-        curses.init_color(69, *special_color)
+        # the screen is drawn once the keys queued so far are applied
+        if loop.redraw and not loop.keys:
+            special_color = change_color(special_color)
 
-        height, width = stdscr.getmaxyx()
+            curses.init_color(69, *special_color)
 
-        # draw screen
-        try:
-            if not started:
-                for x in range(width):
-                    for y in range(height):
-                        if (x - width // 2 + 26, y - height // 2 + 6) in points:
-                            stdscr.addch(y, x, "•", curses.color_pair(3))
-                        else:
-                            try:
-                                stdscr.addch(y, x, "•", curses.color_pair(4))
-                            except:
-                                pass #stdscr.insstr(y, x-1, "•", curses.color_pair(4))
-                center_string(stdscr, " press SPACE to start ", 1, offset=(0, 10))
-            else:
-                outer_navbar(stdscr, outer_option, selected)
-                inner_navbar(stdscr, outer_option, inner_option, selected)
-                content(
-                    content_window,
-                    outer_option, inner_option,
-                    selected,
-                    text_input, text_mode, text_box, text_index,
-                    removing, day,
-                    map_settings, new_habit,
-                    hide_completed
-                )
-                status_bar(stdscr, text_input, text_mode, message)
-        except curses.error:
-            try:
-                stdscr.clear()
-                center_string(stdscr, "hi, your screen is too small...", offset=(0, -1))
-                center_string(stdscr, "please zoom out or enlarge your window! :3", offset=(0, 1))
-            except:
-                pass
+            # draw screen
+            with loop.frame(started):
+                if not started:
+                    loop.splash()
+                else:
+                    # content() refreshes the content window, and loop.frame the screen after
+                    # it: only the changed lines of the screen are copied, so none cover it
+                    with loop.stats.timing("navbars"):
+                        outer_navbar(screen, outer_option, selected)
+                        inner_navbar(screen, outer_option, inner_option, selected)
+                    with loop.stats.timing("status_bar"):
+                        status_bar(screen, text_input, text_mode, message)
+                    with loop.stats.timing("content"):
+                        content(
+                            content_window,
+                            outer_option, inner_option,
+                            selected,
+                            text_input, text_mode, text_box, text_index,
+                            removing, day,
+                            map_settings, new_habit,
+                            hide_completed, scroll
+                        )
 
-        # fetch all habits, and add a log for today (unless type == duration)
-        habits = Habit.load_habits()
-        for habit_id in habits:
-            habit = habits[habit_id]
-            today = date.today().strftime("%Y-%m-%d")
-            if habit["type"] == "progress":
-                if today not in habit["data"]:
-                    ProgressHabit.add_progress_record(habit_id, today, 0)
-            elif habit["type"] == "frequency":
-                if today not in habit["data"]:
-                    FrequencyHabit.add_occurrence_record(habit_id, today, 0)
+        key = loop.next_key(started)
+        if key == curses.KEY_RESIZE:
+            loop.resize()
+            continue
 
-        # non-blocking check for key input
-        key = stdscr.getch()
         if key != -1:  # -1 means no key was pressed
+            habits = Habit.load_habits()
             content_window.erase()
             if removing:
                 if key == ord("r"):
                     if outer_option == 0 and inner_option == 0:
-                        parent = Task.get_task(removing)["parent"]
-                        if parent:
-                            Task.edit_task(
-                                parent, subtasks=list(
-                                    set(Task.get_task(parent)["subtasks"]) - {removing}
+                        with Task.batch():
+                            parent = Task.get_task(removing)["parent"]
+                            if parent:
+                                Task.edit_task(
+                                    parent, subtasks=list(
+                                        set(Task.get_task(parent)["subtasks"]) - {removing}
+                                    )
                                 )
-                            )
-                        for subtask in Task.get_task(removing)["subtasks"]:
-                            Task.remove_task(subtask)
-                        Task.remove_task(removing)
+                            for subtask in Task.get_task(removing)["subtasks"]:
+                                Task.remove_task(subtask)
+                            Task.remove_task(removing)
                         removing = ""
                     elif outer_option == 1 and inner_option == 3:
                         Habit.remove_habit(removing)
@@ -158,13 +152,8 @@ def main(stdscr):
                             for_day = (date.today() + timedelta(
                                 days=map_settings["index"]
                             )).strftime("%Y-%m-%d")
-                            records = {
-                                habit: [
-                                    record for record in habits[habit]['data']
-                                    if record[0][:10] == for_day
-                                ] for habit in habits
-                            }
-                            record = records[habit][int(chr(key)) - 1]
+                            records = Habit.index("sessions").on_day(habit, for_day)
+                            record = records[int(chr(key)) - 1]
                         else:
                             habits = {
                                 habit: habits[habit] for habit in habits
@@ -222,13 +211,8 @@ def main(stdscr):
                                         Task.add_task(text_box)
                                     elif inner_option == 2:
                                         Task.add_task(
-                                            text_box, due_date=(
-                                                dt.strptime(day, "%Y-%m-%d") + timedelta(
-                                                    days=(
-                                                        5 - dt.strptime(day, "%Y-%m-%d").weekday()
-                                                    )
-                                                )
-                                            ).strftime("%Y-%m-%d"))
+                                            text_box, due_date=shift_day(day, 5 - weekday(day))
+                                        )
                                     elif inner_option == 3:
                                         Task.add_task(
                                             text_box,
@@ -270,24 +254,25 @@ def main(stdscr):
                                     else:
                                         move_day = ""
 
-                                    task_due_date = dt.strptime(move_day, "%Y-%m-%d")
+                                    task_due_date = day_ordinal(move_day)
                                     try:
-                                        parent_due_date = dt.strptime(
+                                        parent_due_date = day_ordinal(
                                             Task.get_task(
                                                 Task.get_task(task_id)["parent"]
-                                            )["due_date"], "%Y-%m-%d"
+                                            )["due_date"]
                                         )
                                     except:
                                         parent_due_date = task_due_date
 
                                     if move_day and task_due_date <= parent_due_date:
-                                        Task.edit_task(task_id, due_date=move_day)
-                                        Task.edit_task(
-                                            task_id,
-                                            date_history=Task.get_task(task_id)["date_history"] + [
-                                                (date.today().strftime("%Y-%m-%d"), move_day)
-                                            ]
-                                        )
+                                        with Task.batch():
+                                            Task.edit_task(task_id, due_date=move_day)
+                                            Task.edit_task(
+                                                task_id,
+                                                date_history=Task.get_task(task_id)[
+                                                    "date_history"
+                                                ] + [(date.today().strftime("%Y-%m-%d"), move_day)]
+                                            )
                                         message = f"task '{task_name}' scheduled for {move_day}"
                                     elif not move_day:
                                         if not text_box:
@@ -398,9 +383,8 @@ def main(stdscr):
                                         message = "habit target value updated"
                                 case ["new duration record", selected_day, selected_habit, habits]:
                                     try:
-                                        start, end = text_box.split(",")[:2]
-                                        dt.strptime(start, "%Y-%m-%d-%H:%M")
-                                        dt.strptime(end, "%Y-%m-%d-%H:%M")
+                                        # stored zero-padded, so they sort as strings
+                                        start, end = map(typed_timestamp, text_box.split(",")[:2])
                                     except:
                                         message = "invalid time format. try again!"
                                         clear = False
@@ -456,9 +440,14 @@ def main(stdscr):
                                         and re.match(r"\d{4}-\d{2}-\d{2}", text_box)
                                         and check_date(text_box)
                                     ):
-                                        ProgressHabit.add_progress_record(
-                                            selected_habit, text_box, 0
-                                        )
+                                        # ask for the value instead of storing an empty record
+                                        text_mode = [
+                                            f"new {habits[selected_habit]['type']} record",
+                                            text_box, selected_habit, habits
+                                        ]
+                                        text_box = ""
+                                        text_index = 0
+                                        clear = False
                                     else:
                                         message = "invalid date format. try again!"
                                         clear = False
@@ -492,14 +481,14 @@ def main(stdscr):
                     text_index = len(text_box)
                 elif key == curses.KEY_UP:
                     text_index = 0
-                else:
-                    if chr(key) in (
-                        "abcdefghijklmnopqrstuvwxyz"
-                        + "ABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890"
-                        + "!@#$%^&*()_+-=[]{}|;':,.<>/? "
-                    ):
-                        text_box = text_box[:text_index] + chr(key) + text_box[text_index:]
-                        text_index = min(len(text_box), text_index + 1)
+                elif chr(key) in TEXT_CHARACTERS:
+                    # the characters queued behind this one (e.g. pasted text) are inserted
+                    # along with it
+                    typed = chr(key)
+                    while loop.keys and chr(loop.keys[0]) in TEXT_CHARACTERS:
+                        typed += chr(loop.keys.popleft())
+                    text_box = text_box[:text_index] + typed + text_box[text_index:]
+                    text_index = min(len(text_box), text_index + len(typed))
             elif key == curses.KEY_UP:
                 selected[0] -= 1
                 if selected[0] == -1:
@@ -521,6 +510,11 @@ def main(stdscr):
                                     habit: habits[habit] for habit in habits
                                     if habits[habit]['type'] == "duration"
                                 }
+                            elif map_settings["based_on"] != 0:
+                                habits = {
+                                    habit: habits[habit] for habit in habits
+                                    if habits[habit]['type'] in ["progress", "frequency"]
+                                }
                             if habits:
                                 if map_settings["based_on"] == 0:
                                     habits = {
@@ -530,7 +524,10 @@ def main(stdscr):
                                     selected[0] = 3 + len(habits)
                                 else:
                                     habit = list(habits.keys())[map_settings["index"] % len(habits)]
-                                    selected[0] = 3 + len(habits[habit]["data"])
+                                    selected[0] = 3 + len(
+                                        habits[habit]["data"] if inner_option == 0
+                                        else get_daily_records(habits[habit])
+                                    )
                         elif inner_option == 2:
                             selected[0] = 4 + (len(habits) if map_settings["based_on"] != 4 else 7)
                         elif inner_option == 3:
@@ -565,13 +562,21 @@ def main(stdscr):
                                 habit: habits[habit] for habit in habits
                                 if habits[habit]['type'] == "duration"
                             }
+                        elif map_settings["based_on"] != 0:
+                            habits = {
+                                habit: habits[habit] for habit in habits
+                                if habits[habit]['type'] in ["progress", "frequency"]
+                            }
                         if habits:
                             if map_settings["based_on"] == 0:
                                 if selected[0] == 4 + len(habits):
                                     selected[0] = 0
                             else:
                                 habit = list(habits.keys())[map_settings["index"] % len(habits)]
-                                if selected[0] == 4 + len(habits[habit]["data"]):
+                                if selected[0] == 4 + len(
+                                    habits[habit]["data"] if inner_option == 0
+                                    else get_daily_records(habits[habit])
+                                ):
                                     selected[0] = 0
                     elif inner_option == 2:
                         if selected[0] == 5 + (len(habits) if map_settings["based_on"] != 4 else 7):
@@ -606,21 +611,15 @@ def main(stdscr):
                 elif outer_option == 0:
                     if selected[0] == 2:
                         if inner_option == 1:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") - timedelta(days=1)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, -1)
                         elif inner_option == 2:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") - timedelta(weeks=1)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, -7)
                         elif inner_option == 3:
-                            day = (dt.strptime(day, "%Y-%m-%d") - timedelta(
-                                days=calendar.monthrange(int(day[:4]), int(day[5:7]))[1]
-                            )).strftime("%Y-%m-%d")
+                            day = shift_day(
+                                day, -calendar.monthrange(int(day[:4]), int(day[5:7]))[1]
+                            )
                         elif inner_option == 4:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") - timedelta(days=365)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, -365)
                     else:
                         selected[1] -= 1
                         if selected[1] == -1:
@@ -687,21 +686,15 @@ def main(stdscr):
                 elif outer_option == 0:
                     if selected[0] == 2:
                         if inner_option == 1:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") + timedelta(days=1)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, 1)
                         elif inner_option == 2:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") + timedelta(weeks=1)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, 7)
                         elif inner_option == 3:
-                            day = (dt.strptime(day, "%Y-%m-%d") + timedelta(
-                                days=calendar.monthrange(int(day[:4]), int(day[5:7]))[1]
-                            )).strftime("%Y-%m-%d")
+                            day = shift_day(
+                                day, calendar.monthrange(int(day[:4]), int(day[5:7]))[1]
+                            )
                         elif inner_option == 4:
-                            day = (
-                                dt.strptime(day, "%Y-%m-%d") + timedelta(days=365)
-                            ).strftime("%Y-%m-%d")
+                            day = shift_day(day, 365)
                     else:
                         selected[1] += 1
                         if selected[1] == len(config["tasks"]["day"]["details"]):
@@ -755,11 +748,14 @@ def main(stdscr):
                         selected[1] = 0
             elif chr(key) == "q" or key == 27:
                 break
+            elif chr(key) == "`":
+                loop.overlay = not loop.overlay
+                content_window.touchwin()  # painted over by the overlay
             elif not started:
                 match chr(key):
                     case " ":
                         started = True
-                        stdscr.clear()
+                        screen.clear()
             elif chr(key) == "h":
                 hide_completed = not hide_completed
                 selected[0] = min(selected[0], len(get_task_list(hide_completed)) + 1)
@@ -823,7 +819,7 @@ def main(stdscr):
                             case "v":
                                 outer_option = 0
                                 inner_option = 0
-                                selected[0] = 2 + get_task_list(hide_completed).index(task["id"])
+                                selected[0] = 2 + Task.tree().position(task["id"], hide_completed)
                                 selected[1] = -1
                             case "e":
                                 text_input = True
@@ -899,9 +895,9 @@ def main(stdscr):
                                         selected_habit = habits_keys[selected[0] - 4]
                                     else:
                                         selected_habit = habits_keys[index % len(habits)]
-                                        daylist = list(sorted(
-                                            habits[selected_habit]["data"].keys()
-                                        ))
+                                        daylist = list(
+                                            get_daily_records(habits[selected_habit]).keys()
+                                        )
                                         selected_day = daylist[selected[0] - 4]
                                 text_input = True
                                 mode = f"new {habits[selected_habit]['type']} record"
@@ -929,10 +925,8 @@ def main(stdscr):
                                     selected_habit = list(habits.keys())[selected[0] - 5]
 
                                     selected_day = get_dates(
-                                        dt.strptime(start_day, "%Y-%m-%d"), 
-                                        dt.strptime(end_day, "%Y-%m-%d"), 
-                                        based_on
-                                    )[selected[1]].strftime("%Y-%m-%d")[:10]
+                                        parse_day(start_day), parse_day(end_day), based_on
+                                    )[selected[1]].isoformat()
                                     text_input = True
                                     text_mode = [
                                         f"new {habits[selected_habit]['type']} record",
@@ -944,10 +938,9 @@ def main(stdscr):
                                     ]
                                     this_year = date.today().year
                                     start_day = get_sunday(f"{this_year}-01-01")
-                                    selected_day = dt.strptime(start_day, "%Y-%m-%d") + timedelta(
-                                        weeks=selected[1], days=selected[0] - 5
+                                    selected_day = shift_day(
+                                        start_day, 7 * selected[1] + selected[0] - 5
                                     )
-                                    selected_day = selected_day.strftime("%Y-%m-%d")
                                     if selected_day[:4] == str(this_year):
                                         text_input = True
                                         text_mode = [
@@ -995,8 +988,13 @@ def main(stdscr):
             else:
                 pass
 
-        time.sleep(0.02)
-        stdscr.refresh()
+    return loop.wakeups
 
 if __name__ == "__main__":
-    curses.wrapper(main)
+    if "--import-json" in sys.argv:
+        import_json()
+        print("tasks.json and habits.json imported into dots.db.")
+    else:
+        stats = curses.wrapper(main)
+        if "--stats" in sys.argv:
+            print(stats.summary())
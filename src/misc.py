@@ -1,7 +1,9 @@
 import curses
+
 from datetime import datetime as dt
 
 from modules import Task, Habit
+from points import points
 
 def display_borders(window, selected, split=False, task_list=[]):
     """
@@ -34,6 +36,55 @@ def display_borders(window, selected, split=False, task_list=[]):
             window.addstr(y, 0, "║" + " " * (max_x - 2) + "║", curses.color_pair(1))
         window.addstr(max_y, 0, "╚" + "═" * (max_x - 2) + "╝")
 
+def scroll_viewport(scroll, key, selected_row, rows, height):
+    """
+    Keep the selected row (None if no row is selected) inside a viewport of height rows,
+    and return the first row shown. The offset is kept in scroll under key, so the view
+    only moves when the selection leaves it.
+    """
+    offset = scroll.get(key, 0)
+    if selected_row is not None:
+        selected_row = min(selected_row, rows - 1)
+        if selected_row < offset:
+            offset = selected_row
+        elif selected_row >= offset + height:
+            offset = selected_row - height + 1
+    offset = max(0, min(offset, rows - height))
+    scroll[key] = offset
+    return offset
+
+def display_scrollbar(window, top, x, height, offset, rows):
+    """
+    Draw a scrollbar over the border in column x, next to a viewport of height rows from
+    row top, and which of the rows are shown on the bottom border of the content box.
+    """
+    if rows <= height:
+        return
+    thumb = max(1, height * height // rows)
+    start = (height - thumb) * offset // (rows - height)
+    for y in range(height):
+        window.addstr(
+            top + y, x, "█" if start <= y < start + thumb else "║", curses.color_pair(1)
+        )
+    position = f" {offset + 1}-{offset + height} of {rows} "
+    window.addstr(
+        window.getmaxyx()[0] - 4, x - len(position) - 1, position, curses.color_pair(1)
+    )
+
+# the layout each view was last built with, and the key it was built for
+layouts = {}
+
+def cached_layout(view, key, build):
+    """
+    Return the layout of a view: what it shows that doesn't depend on the selection, like
+    its rows, the widths of its columns and its totals, as returned by build(). It is only
+    built again when the key changed (the version of the data, the settings of the view and
+    the size of the window), so moving the selection only draws the layout again.
+    """
+    if layouts.get(view, (None,))[0] != key:
+        layouts[view] = (key, build())
+    return layouts[view][1]
+
 def display_text_box(window, text_input, text_box, text_index):
     """Display the input text box at the bottom of the screen."""
     max_y, max_x = window.getmaxyx()
@@ -53,6 +104,24 @@ def display_text_box(window, text_input, text_box, text_index):
     else:
         window.addstr(max_y - 2, len(text_box) + 2, " ", curses.color_pair(1))
 
+def debug_overlay(stdscr, lines, width=36):
+    """
+    Draw the stats of the last frame in a box at the top right of the content, in a window
+    of its own so that it is painted over the content window.
+    """
+    max_y, max_x = stdscr.getmaxyx()
+    height = len(lines) + 2
+    if not lines or width + 2 > max_x or height + 6 > max_y:
+        return
+    window = curses.newwin(height, width, 3, max_x - width - 2)
+    window.addstr(0, 0, "╔" + "═" * (width - 2) + "╗")
+    for y, line in enumerate(lines, 1):
+        line = line[:width - 4].ljust(width - 4)
+        window.addstr(y, 0, "║ " + line + " ║", curses.color_pair(1))
+    # The bottom right corner can't be added without moving the cursor off the window
+    window.insstr(height - 1, 0, "╚" + "═" * (width - 2) + "╝")
+    window.noutrefresh()
+
 def coming_soon(window):
     """
     print a coming soon message for pending features.
@@ -123,32 +192,33 @@ def status_bar(window, text_input, text_mode, message):
 
 def change_task_parent(task_id, new_parent_id):
     """Change the parent of a task and update subtasks of both old and new parents."""
-    tasks = Task.load_tasks()
-    task = tasks[task_id]
-
-    # If removing the parent (new_parent_id is None)
-    if new_parent_id is None:
-        # Remove the task from its current parent's subtasks
-        for parent_id in tasks:
-            if task_id in tasks[parent_id]["subtasks"]:
-                Task.edit_task(
-                    parent_id, subtasks=list(set(tasks[parent_id]["subtasks"]) - {task_id})
-                )
-        Task.edit_task(task_id, parent=None)
-    else:
-        new_parent = tasks[new_parent_id]
+    with Task.batch():
+        tasks = Task.load_tasks()
+        task = tasks[task_id]
 
-        # Remove the task from its old parent if it had one
-        if task["parent"]:
+        # If removing the parent (new_parent_id is None)
+        if new_parent_id is None:
+            # Remove the task from its current parent's subtasks
             for parent_id in tasks:
                 if task_id in tasks[parent_id]["subtasks"]:
                     Task.edit_task(
                         parent_id, subtasks=list(set(tasks[parent_id]["subtasks"]) - {task_id})
                     )
+            Task.edit_task(task_id, parent=None)
+        else:
+            new_parent = tasks[new_parent_id]
+
+            # Remove the task from its old parent if it had one
+            if task["parent"]:
+                for parent_id in tasks:
+                    if task_id in tasks[parent_id]["subtasks"]:
+                        Task.edit_task(
+                            parent_id, subtasks=list(set(tasks[parent_id]["subtasks"]) - {task_id})
+                        )
 
-        # Set the new parent and update its subtasks
-        Task.edit_task(task_id, parent=new_parent_id)
-        Task.edit_task(new_parent_id, subtasks=list(set(new_parent["subtasks"] + [task_id])))
+            # Set the new parent and update its subtasks
+            Task.edit_task(task_id, parent=new_parent_id)
+            Task.edit_task(new_parent_id, subtasks=list(set(new_parent["subtasks"] + [task_id])))
 
 def edit_task_parent(selected, text_box, task_list):
     """Process the input to edit the parent of the selected task."""
@@ -270,6 +340,21 @@ def check_date(string):
         return False
     return True
 
+def splash_screen(stdscr):
+    """
+    lay out the home screen: a field of dots with the logo in color 69, which is animated
+    by changing the color itself, so this only has to be drawn again for a new size.
+    """
+    height, width = stdscr.getmaxyx()
+    for y in range(height):
+        # inserted, as adding the bottom right corner would move the cursor off the screen
+        stdscr.insstr(y, 0, "•" * width, curses.color_pair(4))
+    for x, y in points:
+        x, y = x + width // 2 - 26, y + height // 2 - 6
+        if 0 <= x < width and 0 <= y < height and (x, y) != (width - 1, height - 1):
+            stdscr.addstr(y, x, "•", curses.color_pair(3))
+    center_string(stdscr, " press SPACE to start ", 1, offset=(0, 10))
+
 def center_string(window, string, color_pair=0, offset=(0, 0)):
     """
     center a string in the middle of a screen.
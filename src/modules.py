@@ -1,37 +1,33 @@
-import os
 import uuid
-import json
 
-from datetime import date, timedelta, datetime as dt
+from datetime import date, datetime as dt
 
-def load_items(filename):
-    try:
-        with open(filename, 'r', encoding='utf-8') as file:
-            return json.load(file)  # Load and return tasks as a dictionary
-    except FileNotFoundError:
-        return {}  # Return empty dict if file does not exist
-    except json.JSONDecodeError:
-        return {}  # Return empty dict if JSON is invalid
-
-def save_items(items, filename):
-    with open(filename, 'w', encoding='utf-8') as file:
-        json.dump(items, file, indent=4)  # Save tasks in a pretty format
+from storage import open_store
+from indexes import changing, TaskTree, DateIndex, SessionIndex
+from rollups import Rollups
+from dates import timestamp_minute, minute_timestamp, Timestamps
 
 class Task:
+    # Kept up to date with the changes made through Task
+    indexes = {"tree": TaskTree(), "dates": DateIndex()}
+
     def __init__(
         self, name,
-        due_date=date.today().strftime("%Y-%m-%d"),
+        due_date=None,
         due_type="day", priority=2, tags=[], subtasks=[], parent=""
     ):
+        if due_date is None:
+            # Resolved on each call, so long-running sessions don't keep the day they started
+            due_date = date.today().strftime("%Y-%m-%d")
         self.id = str(uuid.uuid4())  # Unique identifier for the task
         self.name = name  # Task name
         self.due_date = due_date  # Task due date (string, could be a day/week/month-based format)
         self.due_type = due_type
         self.priority = priority  # Priority: low, medium, high (default: medium)
         self.completed = False  # Task completion status (default: False)
-        self.subtasks = subtasks   # List of subtasks (empty by default)
+        self.subtasks = list(subtasks)   # List of subtasks (empty by default)
         self.parent = parent  # List of parent tasks (empty by default)
-        self.tags = tags  # Optional tags (default: empty list)
+        self.tags = list(tags)  # Optional tags (default: empty list)
         self.date_added = str(dt.now().date())  # When the task was originally scheduled
         self.date_history = []  # Track any past due dates for this task
         self.recurrence = {
@@ -40,20 +36,51 @@ class Task:
         }
 
     @staticmethod
-    def load_tasks(filename=os.path.join(os.path.expanduser("~"), ".dots", "tasks.json")):
-        return load_items(filename)
+    def store():
+        return open_store("tasks")
+
+    @staticmethod
+    def load_tasks():
+        return Task.store().load()
+
+    @staticmethod
+    def save_tasks(tasks):
+        Task.store().save(tasks)
+
+    @staticmethod
+    def batch():
+        """Group task changes so they are loaded once and saved in a single write."""
+        return Task.store().batch()
 
     @staticmethod
-    def save_tasks(tasks, filename=os.path.join(os.path.expanduser("~"), ".dots", "tasks.json")):
-        save_items(tasks, filename)
+    def version():
+        """Return the version of the tasks, after picking up changes made to the file."""
+        store = Task.store()
+        store.load()
+        return store.version
+
+    @staticmethod
+    def index(name):
+        """Return an index over the tasks, in sync with the store."""
+        store = Task.store()
+        return Task.indexes[name].sync(store.load(), store.version)
+
+    @staticmethod
+    def tree():
+        """Return the task tree (subtasks, root tasks and the order of the list view)."""
+        return Task.index("tree")
+
+    @staticmethod
+    def changing(task_id):
+        """Update the indexes with the change made to a task inside the block."""
+        return changing(Task.store(), Task.indexes.values(), task_id)
 
     @classmethod
-    def add_task(cls, name, due_date=date.today().strftime("%Y-%m-%d"), due_type="day"):
+    def add_task(cls, name, due_date=None, due_type="day"):
         """Create a new task and add it to the tasks dictionary."""
         task = cls(name, due_date=due_date, due_type=due_type)
-        tasks = cls.load_tasks()  # Load existing tasks
-        tasks[task.id] = vars(task)  # Add task to the dictionary
-        cls.save_tasks(tasks)  # Save updated tasks to JSON
+        with cls.changing(task.id):
+            cls.store().put(task.id, vars(task))  # Add task to the store
         return task.id  # Return the ID of the new task
 
     @classmethod
@@ -62,13 +89,10 @@ class Task:
         tasks = cls.load_tasks()  # Load existing tasks
         task_id = str(task_id)
         if task_id in tasks:  # Check if task exists
-            task_data = tasks[task_id]  # Get task data
             # Update task attributes based on provided kwargs
-            for key, value in kwargs.items():
-                if key in task_data:
-                    task_data[key] = value
-            tasks[task_id] = task_data  # Update the task in the dictionary
-            cls.save_tasks(tasks)  # Save changes to JSON
+            fields = {key: value for key, value in kwargs.items() if key in tasks[task_id]}
+            with cls.changing(task_id):
+                cls.store().update(task_id, fields)  # Save changes to the store
             return True  # Return success
         return False  # Return failure if task not found
 
@@ -77,8 +101,8 @@ class Task:
         """Remove a task by its ID."""
         tasks = cls.load_tasks()  # Load existing tasks
         if task_id in tasks:  # Check if task exists
-            del tasks[task_id]  # Remove the task from the dictionary
-            cls.save_tasks(tasks)  # Save changes to JSON
+            with cls.changing(task_id):
+                cls.store().delete(task_id)  # Remove the task from the store
             return True  # Return success
         return False  # Return failure if task not found
 
@@ -89,6 +113,10 @@ class Task:
         return tasks[task_id]  # Return the task if it exists, else None
 
 class Habit:
+    # Kept up to date with the changes made through Habit, sharing the parsed session times
+    timestamps = Timestamps()
+    indexes = {"sessions": SessionIndex(timestamps), "rollups": Rollups(timestamps)}
+
     def __init__(self, name, habit_type, unit, target_value=""):
         self.id = str(uuid.uuid4())  # Unique identifier for the habit
         self.name = name  # Habit name
@@ -98,20 +126,49 @@ class Habit:
         self.data = {}  # Data will be saved to habits.json
 
     @staticmethod
-    def load_habits(filename=os.path.join(os.path.expanduser("~"), ".dots", "habits.json")):
-        return load_items(filename)
+    def store():
+        return open_store("habits")
+
+    @staticmethod
+    def load_habits():
+        return Habit.store().load()
+
+    @staticmethod
+    def save_habits(habits):
+        Habit.store().save(habits)
+
+    @staticmethod
+    def batch():
+        """Group habit changes so they are loaded once and saved in a single write."""
+        return Habit.store().batch()
 
     @staticmethod
-    def save_habits(habits, filename=os.path.join(os.path.expanduser("~"), ".dots", "habits.json")):
-        save_items(habits, filename)
+    def version():
+        """Return the version of the habits, after picking up changes made to the file."""
+        store = Habit.store()
+        store.load()
+        return store.version
+
+    @staticmethod
+    def index(name):
+        """Return an index over the habits, in sync with the store."""
+        store = Habit.store()
+        return Habit.indexes[name].sync(store.load(), store.version)
+
+    @staticmethod
+    def changing(habit_id, change=None):
+        """
+        Update the indexes with the change made to a habit inside the block. The change can
+        be given as (op, fields), so the indexes that can apply it don't go over the habit.
+        """
+        return changing(Habit.store(), Habit.indexes.values(), habit_id, change)
 
     @classmethod
     def add_habit(cls, name, habit_type, unit, target_value=""):
         """Add a new habit."""
         habit = cls(name, habit_type, unit, target_value)
-        habits = cls.load_habits()  # Load existing habits
-        habits[habit.id] = vars(habit)  # Add habit to the dictionary
-        cls.save_habits(habits)  # Save updated habits to JSON
+        with cls.changing(habit.id):
+            cls.store().put(habit.id, vars(habit))  # Add habit to the store
         return habit.id  # Return the ID of the new habit
 
     @classmethod
@@ -120,14 +177,14 @@ class Habit:
         habits = cls.load_habits()  # Load existing habits
         habit_id = str(habit_id)
         if habit_id in habits:  # Check if habit exists
-            habit_data = habits[habit_id]  # Get habit data
             # Update habit attributes based on provided kwargs
+            fields = {}
             for key, value in kwargs.items():
                 key = key.replace(" ", "_")
-                if key in habit_data:
-                    habit_data[key] = value
-            habits[habit_id] = habit_data  # Update the habit in the dictionary
-            cls.save_habits(habits)  # Save changes to JSON
+                if key in habits[habit_id]:
+                    fields[key] = value
+            with cls.changing(habit_id):
+                cls.store().update(habit_id, fields)  # Save changes to the store
             return True  # Return success
         return False  # Return failure if habit not found
 
@@ -136,8 +193,8 @@ class Habit:
         """Remove a habit by its ID."""
         habits = cls.load_habits()  # Load existing habits
         if habit_id in habits:  # Check if habit exists
-            del habits[habit_id]  # Remove the habit from the dictionary
-            cls.save_habits(habits)  # Save changes to JSON
+            with cls.changing(habit_id):
+                cls.store().delete(habit_id)  # Remove the habit from the store
             return True  # Return success
         return False  # Return failure if habit not found
 
@@ -147,50 +204,80 @@ class Habit:
         habits = cls.load_habits()  # Load existing habits
         return habits.get(habit_id, None)  # Return the habit if it exists, else None
 
+    @classmethod
+    def set_daily_record(cls, habit_id, on_date, value):
+        """Set the record of a progress/frequency habit on a day."""
+        habits = cls.load_habits()
+        if habit_id in habits:
+            with cls.changing(habit_id):
+                if value:
+                    cls.store().set_record(habit_id, on_date, value)  # Add or edit record
+                elif on_date in habits[habit_id]['data']:
+                    # Days without any progress are left out, and read as zero
+                    cls.store().delete_record(habit_id, on_date)
+            return True
+        return False
+
+    @classmethod
+    def strip_empty_records(cls):
+        """Remove the zero records that older versions added for every day."""
+        with cls.batch():
+            habits = cls.load_habits()
+            for habit_id in habits:
+                data = habits[habit_id]['data']
+                if isinstance(data, dict) and 0 in data.values():
+                    with cls.changing(habit_id):
+                        cls.store().update(habit_id, {
+                            'data': {day: value for day, value in data.items() if value}
+                        })
+
 class DurationHabit(Habit):
     def __init__(self, name, target_value=""):
         super().__init__(name, habit_type="duration", unit="hours", target_value=target_value)
         self.data = []
 
+    @staticmethod
+    def split_duration_record(session):
+        """Split a session at every midnight it spans, so each part falls on a single day."""
+        start_time = timestamp_minute(session[0])
+        end_time = timestamp_minute(session[1])
+
+        parts = []
+        part_start = session[0]
+        while start_time // 1440 < end_time // 1440:
+            # Cut the session at the next midnight and continue from there
+            start_time = (start_time // 1440 + 1) * 1440
+            midnight = minute_timestamp(start_time)
+            parts.append([part_start, midnight])
+            part_start = midnight
+
+        # The last part, unless the session ended exactly at midnight
+        if part_start != session[1] or not parts:
+            parts.append([part_start, session[1]])
+        return parts
+
     @classmethod
     def add_duration_record(cls, habit_id, duration_sessions):
+        """
+        Add sessions to a duration habit. Any number of sessions (e.g. an import) can be
+        passed at once, they are then merged into the sorted sessions in a single change.
+        """
         habits = cls.load_habits()  # Load existing habits
 
         if habit_id in habits:
             # Ensure the data structure for this habit is initialized
-            if 'data' not in habits[habit_id]:
-                habits[habit_id]['data'] = []
+            if not isinstance(habits[habit_id].get('data'), list):
+                with cls.changing(habit_id):
+                    cls.store().update(habit_id, {'data': []})
 
             # Split duration sessions if they exceed midnight
             updated_sessions = []
             for session in duration_sessions:
-                start_time = dt.strptime(session[0], "%Y-%m-%d-%H:%M")
-                end_time = dt.strptime(session[1], "%Y-%m-%d-%H:%M")
-
-                # Check if the session exceeds midnight
-                if start_time.date() < end_time.date():
-                    # Split the session into two
-                    midnight = dt.combine(start_time.date() + timedelta(days=1), dt.min.time())
-
-                    # First part: from start to midnight
-                    updated_sessions.append([session[0], midnight.strftime("%Y-%m-%d-%H:%M")])
-
-                    # Second part: from midnight to end
-                    updated_sessions.append([midnight.strftime("%Y-%m-%d-%H:%M"), session[1]])
-                else:
-                    # If it does not exceed midnight, add the session as is
-                    updated_sessions.append(session)
+                updated_sessions.extend(cls.split_duration_record(session))
 
             # Add sessions to the habit data, ensuring they are sorted by start time
-            habits[habit_id]['data'] += updated_sessions
-
-            # Sort the records by start time
-            habits[habit_id]['data'] = sorted(
-                habits[habit_id]['data'],
-                key=lambda x: dt.strptime(x[0], "%Y-%m-%d-%H:%M")
-            )
-
-            cls.save_habits(habits)  # Save updated habits to JSON
+            with cls.changing(habit_id, ("add_sessions", updated_sessions)):
+                cls.store().add_sessions(habit_id, updated_sessions)
             return True
         return False
 
@@ -199,8 +286,8 @@ class DurationHabit(Habit):
         habits = cls.load_habits()
         if habit_id in habits:
             if duration_session:
-                habits[habit_id]['data'].remove(duration_session)  # Remove the session
-            cls.save_habits(habits)  # Save updated habits to JSON
+                with cls.changing(habit_id, ("remove_session", duration_session)):
+                    cls.store().remove_session(habit_id, duration_session)  # Remove the session
             return True
         return False
 
@@ -210,28 +297,18 @@ class ProgressHabit(Habit):
 
     @classmethod
     def add_progress_record(cls, habit_id, on_date, completed_value):
-        habits = cls.load_habits()
-        if habit_id in habits:
-            habits[habit_id]['data'][on_date] = completed_value  # Add record
-            cls.save_habits(habits)
-            return True
-        return False
+        return cls.set_daily_record(habit_id, on_date, completed_value)  # Add record
 
     @classmethod
     def edit_progress_record(cls, habit_id, on_date, new_completed_value):
-        habits = cls.load_habits()
-        if habit_id in habits and on_date in habits[habit_id]['data']:
-            habits[habit_id]['data'][on_date] = new_completed_value  # Edit record
-            cls.save_habits(habits)  # Save changes to JSON
-            return True
-        return False
+        return cls.set_daily_record(habit_id, on_date, new_completed_value)  # Edit record
 
     @classmethod
     def remove_progress_record(cls, habit_id, on_date):
         habits = cls.load_habits()
         if habit_id in habits and on_date in habits[habit_id]['data']:
-            del habits[habit_id]['data'][on_date]  # Remove record
-            cls.save_habits(habits)  # Save changes to JSON
+            with cls.changing(habit_id):
+                cls.store().delete_record(habit_id, on_date)  # Remove record
             return True
         return False
 
@@ -241,27 +318,17 @@ class FrequencyHabit(Habit):
 
     @classmethod
     def add_occurrence_record(cls, habit_id, on_date, occurrences):
-        habits = cls.load_habits()
-        if habit_id in habits:
-            habits[habit_id]['data'][on_date] = occurrences  # Add record
-            cls.save_habits(habits)  # Save updated habits to JSON
-            return True
-        return False
+        return cls.set_daily_record(habit_id, on_date, occurrences)  # Add record
 
     @classmethod
     def edit_occurrence_record(cls, habit_id, on_date, new_occurrences):
-        habits = cls.load_habits()
-        if habit_id in habits and on_date in habits[habit_id]['data']:
-            habits[habit_id]['data'][on_date] = new_occurrences  # Edit record
-            cls.save_habits(habits)  # Save changes to JSON
-            return True
-        return False
+        return cls.set_daily_record(habit_id, on_date, new_occurrences)  # Edit record
 
     @classmethod
     def remove_occurrence_record(cls, habit_id, on_date):
         habits = cls.load_habits()
         if habit_id in habits and on_date in habits[habit_id]['data']:
-            del habits[habit_id]['data'][on_date]  # Remove record
-            cls.save_habits(habits)  # Save changes to JSON
+            with cls.changing(habit_id):
+                cls.store().delete_record(habit_id, on_date)  # Remove record
             return True
         return False
@@ -0,0 +1,13 @@
+import sys
+
+def option(name, default, usage):
+    """
+    return the value given after an option on the command line, or the default if the
+    option isn't given. exits with the usage message if no value follows the option.
+    """
+    if name not in sys.argv:
+        return default
+    i = sys.argv.index(name) + 1
+    if i == len(sys.argv) or sys.argv[i].startswith("-"):
+        sys.exit(usage)
+    return sys.argv[i]
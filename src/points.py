@@ -12,10 +12,10 @@ logo = """
  ..........   ..........      ....      ..........
 """[1:-1]
 
-points = []
+points = set()
 
 logo = logo.split('\n')
 for row in range(len(logo)):
     for char in range(len(logo[row])):
         if logo[row][char] == '.':
-            points.append((char, row))
+            points.add((char, row))
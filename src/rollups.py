@@ -0,0 +1,163 @@
+from array import array
+from datetime import timedelta
+from dateutil.relativedelta import relativedelta
+
+from indexes import Index
+from dates import day_ordinal, timestamp_minute, Timestamps
+
+try:
+    import numpy
+except ImportError:  # the arrays are kept with the standard library instead
+    numpy = None
+
+def period_end(start, based_on):
+    """return the first day after the period (day/week/month/year) that starts on a day."""
+    match based_on:
+        case "week":
+            return start + timedelta(days=7)
+        case "month":
+            return start + relativedelta(months=1)
+        case "year":
+            return start + relativedelta(years=1)
+        case _:
+            return start + timedelta(days=1)
+
+def record_arrays(habit, minute=timestamp_minute):
+    """
+    return the day ordinals of the records of a habit, and how much of its target each of
+    them reached: the hours of a session for duration habits, the value for progress
+    habits, and the occurrences relative to the most ever recorded for frequency habits.
+    the timestamps of the sessions are converted with minute.
+    """
+    data = habit['data']
+    # a target of 0 would make every day infinitely intense
+    target = habit['target_value'] or 1
+    match habit['type']:
+        case "duration" if isinstance(data, list):
+            starts = [minute(session[0]) for session in data]
+            ends = [minute(session[1]) for session in data]
+            ordinals = [start // 1440 for start in starts]
+            if numpy:
+                starts, ends = numpy.array(starts), numpy.array(ends)
+                return numpy.array(ordinals), (ends - starts) / 60 / target
+            return ordinals, [(end - start) / 60 / target for start, end in zip(starts, ends)]
+        case "progress" | "frequency" if isinstance(data, dict):
+            ordinals = [day_ordinal(day) for day in data]
+            if habit['type'] == "frequency":
+                target = max([*data.values(), 1])
+            if numpy:
+                return numpy.array(ordinals), numpy.array(list(data.values()), float) / target
+            return ordinals, [value / target for value in data.values()]
+    return [], []
+
+def day_arrays(ordinals, values):
+    """
+    return the first day ordinal, the total intensity of every day from the first to the
+    last record, and the prefix sums of those totals (sums[i] is the total of the first i
+    days).
+    """
+    first = min(ordinals)
+    if numpy:
+        days = numpy.bincount(ordinals - first, weights=values)
+        return first, days, numpy.concatenate(([0.0], numpy.cumsum(days)))
+    days = array('d', bytes(8 * (max(ordinals) - first + 1)))
+    for ordinal, value in zip(ordinals, values):
+        days[ordinal - first] += value
+    sums = array('d', [0])
+    total = 0
+    for value in days:
+        total += value
+        sums.append(total)
+    return first, days, sums
+
+class Rollups(Index):
+    """
+    the daily intensity of each habit as an array indexed by day ordinal, with its prefix
+    sums, so that the total of any range of days (e.g. a week, month or year of a heatmap)
+    is a difference of two sums instead of a pass over the records. the buckets of a
+    heatmap are kept until the data of that habit changes. the arrays are numpy arrays
+    when numpy is installed, and give the same results either way.
+    """
+
+    def __init__(self, timestamps=None):
+        super().__init__()
+        self.first = {}  # ordinal of the first day in the arrays of each habit
+        self.days = {}  # intensity of each day, from the first day with records to the last
+        self.sums = {}  # sums[i] is the total of the first i days
+        self.cache = {}  # buckets already worked out for each habit
+        self.timestamps = timestamps or Timestamps()  # can be shared with other indexes
+
+    def build(self, items):
+        self.first, self.days, self.sums, self.cache = {}, {}, {}, {}
+        with self.timestamps.building():
+            for habit_id, habit in items.items():
+                self.add(habit_id, habit)
+
+    def add(self, habit_id, habit):
+        for arrays in (self.first, self.days, self.sums, self.cache):
+            arrays.pop(habit_id, None)
+        ordinals, values = record_arrays(habit, self.timestamps.minute)
+        if len(ordinals) == 0:
+            return
+        self.first[habit_id], self.days[habit_id], self.sums[habit_id] = day_arrays(
+            ordinals, values
+        )
+        self.cache[habit_id] = {}
+
+    def update(self, items, item_id, old):
+        # records can be changed in place, so the habit is rolled up again from its data
+        self.add(item_id, items.get(item_id, {"type": None, "data": None}))
+
+    def day(self, habit_id, ordinal):
+        """return the intensity of a habit on a day ordinal."""
+        if habit_id not in self.days:
+            return 0
+        i = ordinal - self.first[habit_id]
+        days = self.days[habit_id]
+        return float(days[i]) if 0 <= i < len(days) else 0
+
+    def totals(self, habit_id, starts, ends):
+        """
+        return the total intensity of a habit in each range of days, from a day ordinal in
+        starts up to (not incl.) the one in ends.
+        """
+        if habit_id not in self.sums:
+            return [0] * len(starts)
+        sums, first = self.sums[habit_id], self.first[habit_id]
+        if numpy:
+            starts = numpy.clip(numpy.array(starts) - first, 0, len(sums) - 1)
+            ends = numpy.clip(numpy.array(ends) - first, starts, len(sums) - 1)
+            return (sums[ends] - sums[starts]).tolist()
+        totals = []
+        for start, end in zip(starts, ends):
+            start = min(max(start - first, 0), len(sums) - 1)
+            end = min(max(end - first, start), len(sums) - 1)
+            totals.append(sums[end] - sums[start])
+        return totals
+
+    def buckets(self, habit_id, based_on, dates, end_day):
+        """
+        return the average daily intensity of a habit in each period (day/week/month/year)
+        starting on one of the dates, only counting the days up to end_day.
+        """
+        if habit_id not in self.sums:
+            return [0] * len(dates)
+        key = (based_on, tuple(dates), end_day)
+        cache = self.cache[habit_id]
+        if key not in cache:
+            if len(cache) > 64:
+                cache.clear()  # heatmaps that were scrolled past
+            if based_on == "day":
+                cache[key] = [self.day(habit_id, start.toordinal()) for start in dates]
+            else:
+                ends = [period_end(start, based_on) for start in dates]
+                last = end_day.toordinal() + 1
+                totals = self.totals(
+                    habit_id,
+                    [start.toordinal() for start in dates],
+                    [min(end.toordinal(), last) for end in ends]
+                )
+                cache[key] = [
+                    total / (end - start).days for total, start, end in zip(totals, dates, ends)
+                ]
+        return cache[key]
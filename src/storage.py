@@ -0,0 +1,615 @@
+import os
+import copy
+import json
+import heapq
+import bisect
+import sqlite3
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import toml
+
+from dates import timestamp_minute
+
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".dots")
+
+try:
+    config = toml.load(os.path.join(DATA_DIR, "config.toml"))
+except FileNotFoundError:
+    config = {}
+
+# reads and writes of all the stores since startup, for the debug overlay
+io_counts = {"loads": 0, "saves": 0, "bytes_read": 0, "bytes_written": 0}
+
+def row_size(row):
+    """return the size of the values in a database row, as a rough count of bytes."""
+    return sum(len(str(value)) for value in row)
+
+def counted(rows, key):
+    """pass database rows through, adding their size to one of the byte counts."""
+    for row in rows:
+        io_counts[key] += row_size(row)
+        yield row
+
+def file_stamp(filename):
+    """return the (inode, mtime, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+
+def session_start(session):
+    # timestamps typed in by hand can leave out the leading zeros, so they are not sorted
+    # as strings
+    return timestamp_minute(session[0])
+
+def insert_sessions(data, sessions):
+    """add sessions to a list of sessions sorted by start time, keeping it sorted."""
+    if len(sessions) <= 16:
+        for session in sessions:
+            bisect.insort(data, session, key=session_start)
+    else:
+        # many sessions (e.g. an import) are sorted once, then merged in a single pass
+        data[:] = heapq.merge(data, sorted(sessions, key=session_start), key=session_start)
+
+def apply_change(items, op, item_id, fields):
+    """apply a single journalled change to a dict of items."""
+    if op == "batch":
+        for change in fields:
+            apply_change(items, *change)
+        return
+    if op != "put" and item_id not in items:
+        return  # the item was removed after this change was journalled
+    match op:
+        case "put":
+            items[item_id] = fields
+        case "update":
+            items[item_id].update(fields)
+        case "delete":
+            del items[item_id]
+        case "set_record":
+            items[item_id]['data'].update(fields)
+        case "delete_record":
+            items[item_id]['data'].pop(fields, None)
+        case "add_sessions":
+            insert_sessions(items[item_id]['data'], fields)
+        case "remove_session":
+            if fields in items[item_id]['data']:
+                items[item_id]['data'].remove(fields)
+
+class JsonStore:
+    """
+    in-memory copy of a json data file, with an append-only journal of changes.
+    reads are served from memory. every change is appended to a journal next to the
+    file as one line, and once the journal grows past the size of the data set it is
+    compacted into a fresh copy of the file. the files are only read again when they
+    change on disk (i.e. another process wrote to them).
+    """
+    _stores = {}
+
+    # the journal is compacted once it is larger than the file, but never below this size
+    min_journal_size = 256 * 1024
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.journal = filename + ".journal"
+        self.items = {}
+        self.stamp = None  # stamps of the file and the journal when they were last read
+        self.offset = None  # how much of the journal has been read, None if it is stale
+        self.pending = None  # changes made in the current batch, None outside of a batch
+        self.version = 0  # bumped whenever the contents of the store change
+
+    @classmethod
+    def open(cls, filename):
+        """return the shared store for a file, creating it if needed."""
+        filename = os.path.abspath(filename)
+        if filename not in cls._stores:
+            cls._stores[filename] = cls(filename)
+        return cls._stores[filename]
+
+    def file_stamp(self):
+        """return the stamps of the file and its journal."""
+        return [file_stamp(self.filename), file_stamp(self.journal)]
+
+    def changed(self):
+        """check if the files were changed on disk since they were last read or written."""
+        return self.file_stamp() != self.stamp
+
+    def load(self):
+        """return the items in the store, reading the files again if they changed."""
+        io_counts["loads"] += 1
+        if self.pending is not None:
+            return self.items  # the batch works on the items as they were when it started
+        stamp = self.file_stamp()
+        if stamp == self.stamp:
+            return self.items
+
+        snapshot = stamp[0]
+        if self.appended(stamp):
+            # only new changes were appended to the journal, so replay just those
+            self.replay()
+        else:
+            try:
+                with open(self.filename, 'r', encoding='utf-8') as file:
+                    self.items = json.load(file)
+                io_counts["bytes_read"] += snapshot[2]
+            except FileNotFoundError:
+                self.items = {}  # empty dict if file does not exist
+            except json.JSONDecodeError:
+                self.items = {}  # empty dict if json is invalid
+            self.offset = None
+            self.replay(snapshot)
+        self.stamp = self.file_stamp()
+        self.version += 1
+        return self.items
+
+    def appended(self, stamp):
+        """
+        check if the only change on disk since the files were last read is that lines were
+        appended to the same journal, for the same file.
+        """
+        snapshot, journal = stamp
+        if not (self.stamp and self.stamp[1] and self.offset is not None and journal):
+            return False
+        return (
+            snapshot == self.stamp[0] and journal[0] == self.stamp[1][0]
+            and journal[2] >= self.offset
+        )
+
+    def replay(self, snapshot=None):
+        """
+        apply the changes in the journal that have not been read yet.
+        when reading the journal from the start, its first line has to carry the stamp of
+        the file it was started for. otherwise the file was rewritten after the journal
+        (e.g. a compaction was interrupted), and its changes are already in the file.
+        """
+        try:
+            with open(self.journal, 'rb') as file:
+                if self.offset is None:
+                    header = file.readline()
+                    io_counts["bytes_read"] += len(header)
+                    if not header.endswith(b"\n") or json.loads(header)["stamp"] != snapshot:
+                        return
+                    self.offset = len(header)
+                file.seek(self.offset)
+                for line in file:
+                    if not line.endswith(b"\n"):
+                        break  # the last change is still being written
+                    change = json.loads(line)
+                    apply_change(self.items, change["op"], change["id"], change["fields"])
+                    self.offset += len(line)
+                    io_counts["bytes_read"] += len(line)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    def save(self, items):
+        """replace the items in the store, write them to disk and start a new journal."""
+        self.items = items
+        io_counts["saves"] += 1
+        self.compact()
+        self.version += 1
+
+    def compact(self):
+        """write the items to disk and start a new journal."""
+        temp = self.filename + ".tmp"
+        with open(temp, 'w', encoding='utf-8') as file:
+            json.dump(self.items, file, indent=4)  # save items in a pretty format
+        os.replace(temp, self.filename)
+
+        header = json.dumps({"stamp": file_stamp(self.filename)}) + "\n"
+        with open(temp, 'w', encoding='utf-8') as file:
+            file.write(header)
+        os.replace(temp, self.journal)
+
+        self.offset = len(header.encode())
+        io_counts["bytes_written"] += file_stamp(self.filename)[2] + self.offset
+        self.stamp = self.file_stamp()
+
+    @contextmanager
+    def batch(self):
+        """
+        group the changes made inside the block, so that they are applied in memory and
+        appended to the journal as a single line when the block ends. the line is only
+        replayed if it was written completely, so the changes are saved all or nothing.
+        """
+        if self.pending is not None:
+            yield  # already in a batch
+            return
+        self.load()
+        self.pending = []
+        try:
+            yield
+        except BaseException:
+            self.pending = None
+            self.stamp = None  # drop the changes made in memory by reading the files again
+            raise
+        changes, self.pending = self.pending, None
+        if changes:
+            # the changes are already applied in memory, unless the files are read again
+            self.change("batch", None, changes, applied=not self.changed())
+
+    def change(self, op, item_id, fields, applied=False):
+        """apply a change to the items in memory and append it to the journal."""
+        if self.pending is not None:
+            apply_change(self.items, op, item_id, fields)
+            self.pending.append([op, item_id, fields])
+            self.version += 1
+            return
+
+        items = self.load()
+        if self.offset is None or self.stamp[1][2] != self.offset:
+            # the journal is missing, stale or ends in a half-written change
+            self.compact()
+        if not applied:
+            apply_change(items, op, item_id, fields)
+            self.version += 1
+
+        line = json.dumps({"op": op, "id": item_id, "fields": fields}) + "\n"
+        with open(self.journal, 'a', encoding='utf-8') as file:
+            file.write(line)
+        self.offset += len(line.encode())
+        io_counts["saves"] += 1
+        io_counts["bytes_written"] += len(line.encode())
+        self.stamp = self.file_stamp()
+
+        snapshot, journal = self.stamp
+        if journal[2] > max(self.min_journal_size, snapshot[2] if snapshot else 0):
+            self.compact()
+
+    def put(self, item_id, item):
+        """add or replace a single item."""
+        self.change("put", item_id, item)
+
+    def update(self, item_id, fields):
+        """change some fields of a single item."""
+        self.change("update", item_id, fields)
+
+    def delete(self, item_id):
+        """remove a single item."""
+        self.change("delete", item_id, None)
+
+    def set_record(self, item_id, day, value):
+        """add or replace the record of a progress/frequency habit on a day."""
+        self.change("set_record", item_id, {day: value})
+
+    def delete_record(self, item_id, day):
+        """remove the record of a progress/frequency habit on a day."""
+        self.change("delete_record", item_id, day)
+
+    def add_sessions(self, item_id, sessions):
+        """add sessions to a duration habit, keeping them sorted by start time."""
+        self.change("add_sessions", item_id, sessions)
+
+    def remove_session(self, item_id, session):
+        """remove a session from a duration habit."""
+        self.change("remove_session", item_id, session)
+
+class SqliteStore(ABC):
+    """
+    in-memory copy of a table in the sqlite database, with point updates.
+    every change is written as a single row update instead of a full rewrite, and the
+    table is read again only when another connection has changed the database. the
+    subclasses lay out their items in tables, see read, clear and write.
+    """
+    _stores = {}
+    _connections = {}
+    _batches = set()  # databases with an open batch, whose connection must not commit yet
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.db = self.connect(filename)
+        self.items = {}
+        self.stamp = None  # data_version of the database when it was last read
+        self.version = 0  # bumped whenever the contents of the store change
+
+    @classmethod
+    def open(cls, filename):
+        """return the shared store for a database, creating it if needed."""
+        filename = os.path.abspath(filename)
+        if (cls, filename) not in cls._stores:
+            cls._stores[(cls, filename)] = cls(filename)
+        return cls._stores[(cls, filename)]
+
+    @classmethod
+    def connect(cls, filename):
+        """return the shared connection to a database, creating its tables if needed."""
+        if filename not in cls._connections:
+            db = sqlite3.connect(filename)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            cls._connections[filename] = db
+        return cls._connections[filename]
+
+    def file_stamp(self):
+        """return the data version of the database, which other connections bump."""
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def changed(self):
+        """check if the database was changed by another connection since it was last read."""
+        return self.file_stamp() != self.stamp
+
+    def load(self):
+        """return the items in the store, reading the table again if it changed."""
+        io_counts["loads"] += 1
+        if self.filename in self._batches:
+            return self.items  # the batch works on the items as they were when it started
+        stamp = self.file_stamp()
+        if stamp != self.stamp:
+            self.items = self.read()
+            self.stamp = stamp
+            self.version += 1
+        return self.items
+
+    @contextmanager
+    def transaction(self):
+        """commit the changes made inside the block, unless they are part of a batch."""
+        if self.filename in self._batches:
+            yield
+        else:
+            io_counts["saves"] += 1
+            with self.db:
+                yield
+
+    @contextmanager
+    def batch(self):
+        """group the changes made inside the block into a single transaction."""
+        if self.filename in self._batches:
+            yield  # already in a batch
+            return
+        self.load()
+        self._batches.add(self.filename)
+        io_counts["saves"] += 1
+        try:
+            with self.db:
+                yield
+        except BaseException:
+            self.stamp = None  # drop the changes made in memory by reading the table again
+            raise
+        finally:
+            self._batches.discard(self.filename)
+
+    @abstractmethod
+    def read(self):
+        """return all the items in the table."""
+
+    @abstractmethod
+    def clear(self):
+        """remove all the items from the table."""
+
+    @abstractmethod
+    def write(self, item_id, item, fields=None):
+        """add or replace the rows of an item, or only the ones holding the given fields."""
+
+    def save(self, items):
+        """replace the items in the store and write them to the database."""
+        with self.transaction():
+            self.clear()
+            for item_id, item in items.items():
+                self.write(item_id, item)
+        self.items = items
+        self.version += 1
+
+    def put(self, item_id, item):
+        """add or replace a single item."""
+        items = self.load()
+        with self.transaction():
+            self.write(item_id, item)
+        items[item_id] = item
+        self.version += 1
+
+    def update(self, item_id, fields):
+        """change some fields of a single item."""
+        items = self.load()
+        items[item_id].update(fields)
+        with self.transaction():
+            self.write(item_id, items[item_id], fields)
+        self.version += 1
+
+class SqliteTaskStore(SqliteStore):
+    """tasks, with indexed columns for the fields that views filter and sort on."""
+
+    def read(self):
+        rows = self.db.execute("SELECT id, fields FROM tasks ORDER BY rowid")
+        rows = counted(rows, "bytes_read")
+        return {task_id: json.loads(fields) for task_id, fields in rows}
+
+    def clear(self):
+        self.db.execute("DELETE FROM tasks")
+
+    def write(self, item_id, item, fields=None):
+        # upserts keep the rowid of existing tasks, so tasks keep their order
+        row = (
+            item_id, item.get('due_date'), item.get('date_added'), item.get('parent'),
+            int(bool(item.get('completed'))), json.dumps(item)
+        )
+        io_counts["bytes_written"] += row_size(row)
+        self.db.execute(
+            "INSERT INTO tasks (id, due_date, date_added, parent, completed, fields) "
+            "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "due_date = excluded.due_date, date_added = excluded.date_added, "
+            "parent = excluded.parent, completed = excluded.completed, fields = excluded.fields",
+            row
+        )
+
+    def delete(self, task_id):
+        """remove a single item."""
+        items = self.load()
+        with self.transaction():
+            self.db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+        del items[task_id]
+        self.version += 1
+
+class SqliteHabitStore(SqliteStore):
+    """habits, with their records kept in separate tables indexed by date."""
+
+    def read(self):
+        habits = {}
+        for habit_id, fields in counted(
+            self.db.execute("SELECT id, fields FROM habits ORDER BY rowid"), "bytes_read"
+        ):
+            habits[habit_id] = json.loads(fields)
+            habits[habit_id]['data'] = [] if habits[habit_id]['type'] == "duration" else {}
+        for habit_id, day, value in counted(self.db.execute(
+            "SELECT habit_id, day, value FROM habit_values ORDER BY habit_id, day"
+        ), "bytes_read"):
+            habits[habit_id]['data'][day] = value
+        for habit_id, start, end in counted(self.db.execute(
+            "SELECT habit_id, start, end FROM habit_sessions ORDER BY habit_id, start"
+        ), "bytes_read"):
+            habits[habit_id]['data'].append([start, end])
+        for habit in habits.values():
+            # the rows are ordered by the start as a string, which is only the order of the
+            # times if they are zero-padded (older versions stored them as they were typed)
+            if isinstance(habit['data'], list) and any(
+                len(start) != 16 for start, _ in habit['data']
+            ):
+                habit['data'].sort(key=session_start)
+        return habits
+
+    def clear(self):
+        self.db.execute("DELETE FROM habits")
+        self.db.execute("DELETE FROM habit_values")
+        self.db.execute("DELETE FROM habit_sessions")
+
+    def write(self, item_id, item, fields=None):
+        row = (
+            item_id, item['type'],
+            json.dumps({key: value for key, value in item.items() if key != 'data'})
+        )
+        io_counts["bytes_written"] += row_size(row)
+        self.db.execute(
+            "INSERT INTO habits (id, type, fields) VALUES (?, ?, ?) ON CONFLICT (id) "
+            "DO UPDATE SET type = excluded.type, fields = excluded.fields",
+            row
+        )
+        if fields is not None and 'data' not in fields:
+            return  # e.g. a rename, which leaves the records as they are
+        self.db.execute("DELETE FROM habit_values WHERE habit_id = ?", (item_id,))
+        self.db.execute("DELETE FROM habit_sessions WHERE habit_id = ?", (item_id,))
+        if item['type'] == "duration":
+            # habits created before they had a type-specific data structure have a dict here
+            sessions = item['data'] if isinstance(item['data'], list) else []
+            self.db.executemany(
+                "INSERT INTO habit_sessions (habit_id, start, end) VALUES (?, ?, ?)",
+                counted([(item_id, start, end) for start, end in sessions], "bytes_written")
+            )
+        else:
+            self.db.executemany(
+                "INSERT INTO habit_values (habit_id, day, value) VALUES (?, ?, ?)",
+                counted(
+                    [(item_id, day, value) for day, value in item['data'].items()],
+                    "bytes_written"
+                )
+            )
+
+    def delete(self, habit_id):
+        """remove a single item."""
+        items = self.load()
+        with self.transaction():
+            self.db.execute("DELETE FROM habits WHERE id = ?", (habit_id,))
+            self.db.execute("DELETE FROM habit_values WHERE habit_id = ?", (habit_id,))
+            self.db.execute("DELETE FROM habit_sessions WHERE habit_id = ?", (habit_id,))
+        del items[habit_id]
+        self.version += 1
+
+    def set_record(self, habit_id, day, value):
+        """add or replace the record of a progress/frequency habit on a day."""
+        items = self.load()
+        io_counts["bytes_written"] += row_size((habit_id, day, value))
+        with self.transaction():
+            self.db.execute(
+                "INSERT OR REPLACE INTO habit_values (habit_id, day, value) VALUES (?, ?, ?)",
+                (habit_id, day, value)
+            )
+        items[habit_id]['data'][day] = value
+        self.version += 1
+
+    def delete_record(self, habit_id, day):
+        """remove the record of a progress/frequency habit on a day."""
+        items = self.load()
+        with self.transaction():
+            self.db.execute(
+                "DELETE FROM habit_values WHERE habit_id = ? AND day = ?", (habit_id, day)
+            )
+        del items[habit_id]['data'][day]
+        self.version += 1
+
+    def add_sessions(self, habit_id, sessions):
+        """add sessions to a duration habit, keeping them sorted by start time."""
+        items = self.load()
+        with self.transaction():
+            self.db.executemany(
+                "INSERT INTO habit_sessions (habit_id, start, end) VALUES (?, ?, ?)",
+                counted([(habit_id, start, end) for start, end in sessions], "bytes_written")
+            )
+        insert_sessions(items[habit_id]['data'], sessions)
+        self.version += 1
+
+    def remove_session(self, habit_id, session):
+        """remove a session from a duration habit."""
+        items = self.load()
+        with self.transaction():
+            # sessions can be recorded twice, so only remove one of the matching rows
+            self.db.execute(
+                "DELETE FROM habit_sessions WHERE rowid = ("
+                "SELECT rowid FROM habit_sessions "
+                "WHERE habit_id = ? AND start = ? AND end = ? LIMIT 1)",
+                (habit_id, *session)
+            )
+        items[habit_id]['data'].remove(session)
+        self.version += 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    due_date TEXT,
+    date_added TEXT,
+    parent TEXT,
+    completed INTEGER,
+    fields TEXT
+);
+CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+CREATE INDEX IF NOT EXISTS tasks_date_added ON tasks (date_added);
+CREATE INDEX IF NOT EXISTS tasks_parent ON tasks (parent);
+CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed);
+
+CREATE TABLE IF NOT EXISTS habits (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    fields TEXT
+);
+CREATE TABLE IF NOT EXISTS habit_values (
+    habit_id TEXT,
+    day TEXT,
+    value,
+    PRIMARY KEY (habit_id, day)
+);
+CREATE INDEX IF NOT EXISTS habit_values_day ON habit_values (day);
+CREATE TABLE IF NOT EXISTS habit_sessions (
+    habit_id TEXT,
+    start TEXT,
+    end TEXT
+);
+CREATE INDEX IF NOT EXISTS habit_sessions_start ON habit_sessions (habit_id, start);
+"""
+
+def open_store(name):
+    """
+    return the store for 'tasks' or 'habits', using the backend set in config.toml.
+    """
+    backend = config.get("storage", {}).get("backend", "json")
+    if backend == "sqlite":
+        store_class = SqliteTaskStore if name == "tasks" else SqliteHabitStore
+        return store_class.open(os.path.join(DATA_DIR, "dots.db"))
+    return JsonStore.open(os.path.join(DATA_DIR, f"{name}.json"))
+
+def import_json():
+    """
+    copy the contents of tasks.json and habits.json into the sqlite database.
+    """
+    database = os.path.join(DATA_DIR, "dots.db")
+    for name, store_class in [("tasks", SqliteTaskStore), ("habits", SqliteHabitStore)]:
+        items = JsonStore.open(os.path.join(DATA_DIR, f"{name}.json")).load()
+        store_class.open(database).save(copy.deepcopy(items))
@@ -1,59 +1,22 @@
 import curses
 import calendar
-from datetime import datetime as dt, date, timedelta
+from datetime import date
 import os
 import toml
 
 from modules import Task
-from misc import display_borders
+from misc import display_borders, scroll_viewport, display_scrollbar, cached_layout
+from dates import day_ordinal, shift_day, today_ordinal, weekday
 
 config = toml.load(os.path.join(os.path.expanduser("~"), ".dots", "config.toml"))
 
 def all_subtasks_completed(task_key):
     """check if the task and all its subtasks are marked as completed."""
-    task = Task.get_task(task_key)
-    if not task.get('completed', False):  # check if the task itself is not completed
-        return False
-
-    # check recursively for all subtasks
-    for subtask_key in task.get('subtasks', []):
-        if not all_subtasks_completed(subtask_key):
-            return False
-    return True
-
-def traverse_tasks(task_key, tasks, clean_list, hide_completed=False):
-    """
-    recursively traverse through the task and its subtasks, adding them to the clean list.
-    if hide_completed is true, skip tasks where the task and all its subtasks are completed.
-    """
-    # skip the task if hide_completed is true and all subtasks are completed
-    if hide_completed and tasks[task_key]["completed"]:
-        return
-
-    clean_list.append(task_key)  # add the parent task key
-
-    # recursively add subtasks
-    for subtask_key in tasks[task_key].get('subtasks', []):
-        traverse_tasks(subtask_key, tasks, clean_list, hide_completed=hide_completed)
+    return Task.tree().subtree_completed(task_key)
 
 def get_task_list(hide_completed=False):
     """return a clean list of tasks and their subtasks in a structured order."""
-    tasks = Task.load_tasks()  # load all tasks
-    clean_list = []
-
-    # find tasks without parents (root tasks)
-    for task_key in tasks:
-        if not tasks[task_key].get('parent'):
-            traverse_tasks(task_key, tasks, clean_list, hide_completed=hide_completed)
-
-    clean_list.sort(
-        key=lambda x: (
-            int(tasks[x]["completed"]),
-            -dt.timestamp(dt.strptime(tasks[x]["due_date"], "%Y-%m-%d"))
-        )
-    )
-
-    return clean_list
+    return Task.tree().order(hide_completed)
 
 def check_migrated(history, to_date):
     """check if a task has been migrated."""
@@ -66,74 +29,54 @@ def tasks_for_day(day=None):
     """return tasks for a day."""
     if day is None:
         day = date.today().strftime("%Y-%m-%d")
-    tasks = [
-        task for _, task in Task.load_tasks().items() if (
-            task['due_date'] == day
-            or task['date_added'] == day
-            or check_migrated(task['date_history'], day)
-        )
-    ]
-    tasks.sort(key=lambda x: (
-        int(x["completed"]),
-        -dt.timestamp(dt.strptime(x["due_date"], "%Y-%m-%d"))
-    ))
-    return tasks
+    return tasks_for_days(day, day)
 
 def tasks_for_days(start, end):
     """return tasks for several days."""
-    tasks = []
-    start = dt.strptime(start, "%Y-%m-%d")
-    end = dt.strptime(end, "%Y-%m-%d")
-    for day in range((end - start).days + 1):
-        this_date = (start + timedelta(days=day)).strftime("%Y-%m-%d")
-        for task in tasks_for_day(this_date):
-            if task not in tasks:
-                tasks.append(task)
-    tasks.sort(key=lambda x: (
-        int(x["completed"]),
-        -dt.timestamp(dt.strptime(x["due_date"], "%Y-%m-%d"))
-    ))
-    return tasks
+    tasks = Task.load_tasks()
+    return [tasks[task_id] for task_id in Task.index("dates").between(start, end)]
 
 def tasks_for_week(day):
     """return tasks for a week."""
-    start = (
-        dt.strptime(day, "%Y-%m-%d") - timedelta(days=dt.strptime(day, "%Y-%m-%d").weekday()-1)
-    ).strftime("%Y-%m-%d")
-    end = (dt.strptime(start, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
+    start = shift_day(day, -(weekday(day) - 1))
+    end = shift_day(start, 6)
     tasks = tasks_for_days(start, end)
     return tasks
 
 def tasks_for_month(day):
     """return tasks for a month."""
-    start = dt.strptime(day, "%Y-%m-%d").replace(day=1).strftime("%Y-%m-%d")
-    end = (dt.strptime(start, "%Y-%m-%d") + timedelta(days=31)).strftime("%Y-%m-%d")
+    start = f"{day[:7]}-01"
+    end = shift_day(start, 31)
     tasks = tasks_for_days(start, end)
     return tasks
 
 def tasks_for_year(day):
     """return tasks for a year."""
-    start = dt.strptime(day, "%Y-%m-%d").replace(month=1, day=1).strftime("%Y-%m-%d")
-    end = dt.strptime(start, "%Y-%m-%d").replace(month=12, day=31).strftime("%Y-%m-%d")
+    start = f"{day[:4]}-01-01"
+    end = f"{day[:4]}-12-31"
     tasks = tasks_for_days(start, end)
     return tasks
 
 def display_task(
     window,
-    task_key, selected, task_list,
+    task_key, selected,
     text_mode,
-    indent=0, split_x=0, box='wide',
-    removing="", removing_subtask=False,
+    split_x=0, box='wide',
+    removing="",
     hide_completed=False
 ):
-    """display a task and its subtasks with indentation, adapted for two split boxes."""
+    """display a task with the indentation of the list view, adapted for two split boxes."""
     tasks = Task.load_tasks()
     task = tasks[str(task_key)]
     if not task:
         return  # skip if task not found
 
+    tree = Task.tree()
+    indent = tree.depth(task_key, hide_completed)
+    removing_subtask = task_key in tree.children.get(removing, [])
+
     if window.getyx()[0] <= window.getmaxyx()[0] - 7:
-        task_number = get_task_list(hide_completed).index(task_key)
+        task_number = tree.position(task_key, hide_completed)
 
         # choose the starting column based on the box ('left' or 'right')
         start_col = 2 if box != 'right' else split_x + 3
@@ -144,7 +87,7 @@ def display_task(
         important = "! " if task['priority'] == 3 else "  "
 
         if text_mode == "edit parent":
-            number = len(task_list)
+            number = task_number
             window.addstr(
                 window.getyx()[0], end_col - 1,
                 f"({number})".rjust(12) if selected[0] != task_number + 2 else " " * 12
@@ -199,18 +142,6 @@ def display_task(
                 curses.color_pair(7)
             )
 
-    task_list.append(task_key)
-    for subtask_key in task['subtasks']:
-        if not(tasks[subtask_key]["completed"] and hide_completed):
-            display_task(
-                window,
-                subtask_key, selected, task_list,
-                text_mode,
-                indent + 1, split_x, box,
-                removing, bool(removing == task_key),
-                hide_completed=hide_completed
-            )
-
 def display_task_details(window, task_id, split_x, selected):
     """
     display the attributes of the selected task in the right box,
@@ -222,11 +153,11 @@ def display_task_details(window, task_id, split_x, selected):
         return
 
     try:
-        due_date = dt.strptime(task['due_date'], '%Y-%m-%d')
+        due_date = day_ordinal(task['due_date'])
     except:
         passed = False
     else:
-        passed = due_date.date() < dt.now().date()
+        passed = due_date < today_ordinal()
 
     # define the edit commands for each task attribute
     edit_commands = {
@@ -261,12 +192,14 @@ def display_task_details(window, task_id, split_x, selected):
         base_line = f"{key.ljust(max_key_length)} ({edit_commands[key]}) : "
         base_len = len(base_line)
 
-        # split the value into lines if it exceeds the available width
+        # split the value into lines if it exceeds the available width (at least a character,
+        # so that a narrow window doesn't split it forever)
         lines = []
         value_str = str(value)
-        while len(value_str) > max_width - base_len:
-            lines.append(value_str[:max_width - base_len].rstrip())
-            value_str = value_str[max_width - base_len:].lstrip()
+        value_width = max(max_width - base_len, 1)
+        while len(value_str) > value_width:
+            lines.append(value_str[:value_width].rstrip())
+            value_str = value_str[value_width:].lstrip()
         lines.append(value_str)  # add the remaining part
 
         # display the first line with the base formatting
@@ -282,49 +215,32 @@ def display_task_details(window, task_id, split_x, selected):
         window.move(window.getyx()[0] + 1, split_x + 3)
         count += 1
 
-def display_tasks(window, selected, text_mode, removing, hide_completed):
+def display_tasks(window, selected, text_mode, removing, hide_completed, scroll):
     """main function to display tasks, with task details in the right box when selected."""
     max_x = window.getmaxyx()[1]
-    display_borders(window, selected, split=True, task_list=get_task_list(hide_completed))
-    tasks = Task.load_tasks()
-
-    # group tasks by parent id
-    tasks_by_parent = {}
-
-    for task in tasks:
-        parent_id = tasks[task]['parent']
-        if parent_id and parent_id in list(tasks.keys()):
-            tasks_by_parent.setdefault(parent_id, []).append(task)
-
-    # filter tasks if hide_completed is true
-    if hide_completed:
-        tasks = {key: task for key, task in tasks.items()
-                 if not task['completed'] or not all_subtasks_completed(task["id"])}
-
-    tasks = dict(
-                sorted(
-                    tasks.items(),
-                    key=lambda x: (
-                        int(tasks[x[0]]["completed"]),
-                        -dt.timestamp(dt.strptime(tasks[x[0]]["due_date"], "%Y-%m-%d"))
-                    )
-                )
-            )
+    task_list = get_task_list(hide_completed)
+    display_borders(window, selected, split=True, task_list=task_list)
 
     split_x = max_x // 2 - 1 if selected[0] >= 2 else 0
-    task_list = []
 
-    if selected[0] >= 2 and selected[0] < len(get_task_list(hide_completed)) + 2:
+    # only the tasks that fit in the box are displayed, scrolled to keep the selected one
+    height = window.getmaxyx()[0] - 6
+    offset = scroll_viewport(
+        scroll, "tasks", selected[0] - 2 if selected[0] >= 2 else None, len(task_list), height
+    )
+    visible_tasks = task_list[offset:offset + height]
+
+    if selected[0] >= 2 and selected[0] < len(task_list) + 2:
         # display tasks in the left box
         window.move(0, 0)
-        for task_key in tasks:
-            if not tasks[task_key]['parent']:
-                display_task(
-                    window,
-                    task_key, selected, task_list,
-                    text_mode, split_x=split_x, box='left',
-                    removing=removing, hide_completed=hide_completed
-                )
+        for task_key in visible_tasks:
+            display_task(
+                window,
+                task_key, selected,
+                text_mode, split_x=split_x, box='left',
+                removing=removing, hide_completed=hide_completed
+            )
+        display_scrollbar(window, 1, split_x - 1, height, offset, len(task_list))
 
         if window.getyx()[0] >= window.getmaxyx()[0] - 5:
             window.move(window.getmaxyx()[0] - 5, 4)
@@ -338,7 +254,7 @@ def display_tasks(window, selected, text_mode, removing, hide_completed):
         window.addstr(
             new_task_msg,
             curses.color_pair(
-                4 + 1 * (selected[0] == len(get_task_list(hide_completed)) + 2)
+                4 + 1 * (selected[0] == len(task_list) + 2)
             )
         )
 
@@ -348,13 +264,13 @@ def display_tasks(window, selected, text_mode, removing, hide_completed):
     else:
         # single full-width box display
         window.move(0, 0)
-        for task_key in tasks:
-            if not tasks[task_key]['parent']:
-                display_task(
-                    window,
-                    task_key, selected, task_list,
-                    text_mode, hide_completed=hide_completed
-                )
+        for task_key in visible_tasks:
+            display_task(
+                window,
+                task_key, selected,
+                text_mode, removing=removing, hide_completed=hide_completed
+            )
+        display_scrollbar(window, 1, max_x - 1, height, offset, len(task_list))
 
         if window.getyx()[0] >= window.getmaxyx()[0] - 5:
             window.move(window.getmaxyx()[0] - 5, 4)
@@ -362,15 +278,16 @@ def display_tasks(window, selected, text_mode, removing, hide_completed):
             window.move(window.getyx()[0] + 1, 4)
 
         window.addstr("+ press : to enter a new task", curses.color_pair(
-            4 + 1 * (selected[0] == len(get_task_list(hide_completed)) + 2)
+            4 + 1 * (selected[0] == len(task_list) + 2)
         ))
 
-def draw_task_table(window, data, start_y, start_x, selected, removing):
-    """draw a table contaning info about the tasks"""
-    # calculate the maximum width of each column
-    column_widths = [
-        max(len(str(item)) for item in column) + 2 for column in zip(*data)
-    ][1:-1]
+def draw_task_table(window, data, column_widths, start_y, start_x, selected, removing, scroll):
+    """
+    draw a table contaning info about the tasks. only the rows that fit are drawn, scrolled
+    to keep the selected one in view. returns the row of the bottom border.
+    """
+    # the widths of the columns were measured when the rows were built, copy before fitting
+    column_widths = list(column_widths)
 
     # identify specific columns for prioritization
     headers = data[0][1:-1]
@@ -405,77 +322,71 @@ def draw_task_table(window, data, start_y, start_x, selected, removing):
                 min_name_width, column_widths[name_column_index] - total_excess
             )
 
+    # where each column starts, and where the table ends
+    column_x = [start_x + sum(column_widths[:i]) + i for i in range(len(column_widths))]
+    end_x = start_x + sum(column_widths) + 5
+
+    # the rows that fit above the bottom border and the line below the table
+    rows = len(data) - 1
+    height = max(window.getmaxyx()[0] - start_y - 10, 1)
+    offset = scroll_viewport(
+        scroll, "table", selected[0] - 3 if selected[0] >= 3 else None, rows, height
+    )
+    visible_rows = data[1 + offset:1 + offset + height]
+    bottom_y = start_y + len(visible_rows) + 3
+
     # draw table header
-    for i, header in enumerate(data[0][1:-1]):
-        window.addstr(
-            start_y + 0, start_x + sum(column_widths[:i]) + i,
-            ('╔' if not i else "╦") + '═' * column_widths[i]
-        )
-        window.addstr(
-            start_y + 1, start_x + sum(column_widths[:i]) + i,
-            "║ " + header.ljust(column_widths[i])
-        )
-        window.addstr(
-            start_y + 2, start_x + sum(column_widths[:i]) + i,
-            ('╠' if not i else "╬") + '═' * column_widths[i]
-        )
-        window.addstr(
-            min(window.getmaxyx()[0] - 6, start_y + len(data) + 2),
-            start_x + sum(column_widths[:i]) + i,
-            ('╚' if not i else "╩") + '═' * column_widths[i]
-        )
+    for i, header in enumerate(headers):
+        line = '═' * column_widths[i]
+        window.addstr(start_y + 0, column_x[i], ('╔' if not i else "╦") + line)
+        window.addstr(start_y + 1, column_x[i], "║ " + header.ljust(column_widths[i]))
+        window.addstr(start_y + 2, column_x[i], ('╠' if not i else "╬") + line)
+        window.addstr(bottom_y, column_x[i], ('╚' if not i else "╩") + line)
     for row in range(3):
-        window.addstr(
-            start_y + row, start_x + sum(column_widths) + 5,
-            '║' if row % 2 else ('╗' if not row else '╣')
-        )
-    window.addstr(
-        min(window.getmaxyx()[0] - 6, start_y + len(data) + 2),
-        start_x + sum(column_widths) + 5,
-        '╝'
-    )
+        window.addstr(start_y + row, end_x, '║' if row % 2 else ('╗' if not row else '╣'))
+    window.addstr(bottom_y, end_x, '╝')
 
     # draw table rows
-    for row_idx, row in enumerate(data[1:]):
-        if start_y + row_idx + 3 <= window.getmaxyx()[0] - 7:
-            for i, item in enumerate(row[1:-1]):
+    for row_idx, row in enumerate(visible_rows, offset):
+        y = start_y + row_idx - offset + 3
+        for i, item in enumerate(row[1:-1]):
+            window.addstr(y, column_x[i], "║ ")
+
+            # handle priority and completed columns
+            if i == 0:
+                window.addstr(item[:2], curses.color_pair(8))
+            else:
+                if data[0][i+1] == "priority":
+                    item = ["low", "medium", "high"][item - 1]
+                elif data[0][i+1] == "completed":
+                    item = "yes" if item else "no"
+                if item == "":
+                    item = " " * (column_widths[i] - 2)
+
+                # handle removing subtasks
+                if row[-1] and i == 1:
+                    if row[0] == removing:
+                        item = "this task will be removed"
+                    else:
+                        item = "this subtask will be removed"
+
+                # truncate text and add ellipses if it exceeds column width
+                item_str = str(item)
+                if len(item_str) > column_widths[i]:
+                    item_str = item_str[:column_widths[i] - 5] + "..."
+
                 window.addstr(
-                    start_y + row_idx + 3, start_x + sum(column_widths[:i]) + i,
-                    "║ "
+                    item_str[:column_widths[i] - 2],
+                    curses.color_pair(
+                        5 if ((selected[0] - 3) == row_idx and (selected[1] + 1) == i)
+                        else (4 if (row[2][0] == "x") else 1)
+                    ) if not row[-1] else curses.color_pair(7)
                 )
 
-                # handle priority and completed columns
-                if i == 0:
-                    window.addstr(item[:2], curses.color_pair(8))
-                else:
-                    if data[0][i+1] == "priority":
-                        item = ["low", "medium", "high"][item - 1]
-                    elif data[0][i+1] == "completed":
-                        item = "yes" if item else "no"
-                    if item == "":
-                        item = " " * (column_widths[i] - 2)
-
-                    # handle removing subtasks
-                    if row[-1] and i == 1:
-                        if row[0] == removing:
-                            item = "this task will be removed"
-                        else:
-                            item = "this subtask will be removed"
-
-                    # truncate text and add ellipses if it exceeds column width
-                    item_str = str(item)
-                    if len(item_str) > column_widths[i]:
-                        item_str = item_str[:column_widths[i] - 5] + "..."
-
-                    window.addstr(
-                        item_str[:column_widths[i] - 2],
-                        curses.color_pair(
-                            5 if ((selected[0] - 3) == row_idx and (selected[1] + 1) == i)
-                            else (4 if (row[2][0] == "x") else 1)
-                        ) if not row[-1] else curses.color_pair(7)
-                    )
-
-            window.addstr(start_y + row_idx + 3, start_x + sum(column_widths) + 5, '║')
+        window.addstr(y, end_x, '║')
+
+    display_scrollbar(window, start_y + 3, end_x, height, offset, rows)
+    return bottom_y
 
 def render_task_and_children(
     window, data,
@@ -490,7 +401,7 @@ def render_task_and_children(
     """
 
     # if hide_completed is true and both the task and all its subtasks are completed, skip rendering
-    if hide_completed and task['completed'] and all_subtasks_completed(task["id"]):
+    if hide_completed and all_subtasks_completed(task["id"]):
         return
 
     # mark task priority and bullet style
@@ -532,23 +443,17 @@ def render_task_and_children(
                 bullets=bullets, removing_subtask=task['id'] == removing
             )
 
-def day_view(window, selected, day, removing, hide_completed):
-    """print the day view"""
-    display_borders(window, selected)
-
-    window.addstr(2, 5, "tasks for ")
-    window.addstr(f"< {day} >", curses.color_pair(1 + 4 * (selected[0] == 2)))
-
-    tasks = tasks_for_day(day)
-
+def task_table(window, tasks, day, view_type, removing, hide_completed):
+    """return the rows of the task table of a view, and the widths of its columns."""
     # group tasks by parent id
     tasks_by_parent = {}
     orphaned_tasks = []
 
+    task_ids = {task['id'] for task in tasks}
     for task in tasks:
         parent_id = task['parent']
-        if not parent_id or parent_id not in [t['id'] for t in tasks]:
-            orphaned_tasks.append(task)  # task has no parent in today's tasks
+        if not parent_id or parent_id not in task_ids:
+            orphaned_tasks.append(task)  # task has no parent in the tasks of the view
         else:
             tasks_by_parent.setdefault(parent_id, []).append(task)
 
@@ -562,105 +467,122 @@ def day_view(window, selected, day, removing, hide_completed):
             task, tasks_by_parent,
             0, day,
             removing, hide_completed,
-            bullets=True
+            bullets=view_type == "day"
         )
 
+    # measure the columns (the ids and the removal flags are not shown)
+    column_widths = [
+        max(len(str(item)) for item in column) + 2 for column in zip(*data)
+    ][1:-1]
+    return data, column_widths
+
+def days_layout(window, day, view_type, removing, hide_completed):
+    """
+    return what a view of tasks shows that doesn't depend on the selection: the days it
+    spans, its task table and how many of the tasks due in it are completed.
+    """
+    # determine start and end dates based on the view type
+    if view_type == "day":
+        start = end = day
+        tasks = tasks_for_day(day)
+    elif view_type == "week":
+        start = shift_day(day, -(weekday(day) + 1))
+        end = shift_day(start, 6)
+        tasks = tasks_for_week(day)
+    elif view_type == "month":
+        start = f"{day[:7]}-01"
+        end = f"{day[:7]}-{calendar.monthrange(int(day[:4]), int(day[5:7]))[1]:02}"
+        tasks = tasks_for_month(day)
+    elif view_type == "year":
+        start = f"{day[:4]}-01-01"
+        end = f"{day[:4]}-12-31"
+        tasks = tasks_for_year(day)
+    else:
+        raise ValueError("Invalid view type")
+
+    if view_type in ["month", "year"]:
+        # process tasks (copies, so the shortened due dates don't leak into the task store)
+        tasks = [dict(task) for task in tasks]
+        for task in tasks:
+            if task['due_type'] == "month":
+                task['due_date'] = task['due_date'][:7]
+            elif task['due_type'] == "year":
+                task['due_date'] = task['due_date'][:4]
+    data, column_widths = task_table(window, tasks, day, view_type, removing, hide_completed)
+
+    # the tasks due in the view, and how many of them are completed
+    due_tasks = [task for task in tasks if start <= task['due_date'] <= end]
+    return {
+        "start": start, "end": end,
+        "data": data, "column_widths": column_widths,
+        "due": len(due_tasks), "completed": len([task for task in due_tasks if task['completed']]),
+    }
+
+def tasks_layout(window, day, view_type, removing, hide_completed):
+    """return the layout of a view of tasks, which is only built again when it changed."""
+    return cached_layout(
+        f"tasks/{view_type}",
+        (day, removing, hide_completed, Task.version(), window.getmaxyx()),
+        lambda: days_layout(window, day, view_type, removing, hide_completed)
+    )
+
+def day_view(window, selected, day, removing, hide_completed, scroll):
+    """print the day view"""
+    display_borders(window, selected)
+    layout = tasks_layout(window, day, "day", removing, hide_completed)
+
+    window.addstr(2, 5, "tasks for ")
+    window.addstr(f"< {day} >", curses.color_pair(1 + 4 * (selected[0] == 2)))
+
     # draw the table
-    draw_task_table(window, data, 4, 5, selected, removing)
+    bottom_y = draw_task_table(
+        window, layout["data"], layout["column_widths"], 4, 5, selected, removing, scroll
+    )
 
-    # calculate and display completed tasks for today
-    due_today = [task for task in tasks if task['due_date'] == day]
-    completed_today = len([task for task in due_today if task['completed']])
+    # display completed tasks for today
     if removing:
         window.addstr(
-            len(data) + 8, 5,
+            bottom_y + 2, 5,
             "press r to confirm removal, esc to cancel",
             curses.color_pair(7)
         )
     else:
         window.addstr(
-            len(data) + 8, 5,
-            f"completed tasks due today: ({completed_today}/{len(due_today)}) " +
+            bottom_y + 2, 5,
+            f"completed tasks due today: ({layout['completed']}/{layout['due']}) " +
             f"({
                 str(
-                    round(completed_today / len(due_today) * 100, 2)
-                ) + '%' if len(due_today) else 'n/a'
+                    round(layout['completed'] / layout['due'] * 100, 2)
+                ) + '%' if layout['due'] else 'n/a'
             })",
         )
 
-def days_view(window, selected, day, removing, hide_completed, view_type):
+def days_view(window, selected, day, removing, hide_completed, scroll, view_type):
     """print a view spanning several days."""
     display_borders(window, selected)
-
-    # determine start and end dates based on the view type
-    if view_type == "week":
-        start = (
-            dt.strptime(day, "%Y-%m-%d") - timedelta(
-                days=dt.strptime(day, "%Y-%m-%d").weekday() + 1
-            )
-        ).strftime("%Y-%m-%d")
-        end = (dt.strptime(start, "%Y-%m-%d") + timedelta(days=6)).strftime("%Y-%m-%d")
-        tasks = tasks_for_week(day)
-    elif view_type == "month":
-        start = dt.strptime(day, "%Y-%m-%d").replace(day=1).strftime("%Y-%m-%d")
-        end = dt.strptime(start, "%Y-%m-%d").replace(
-            day=calendar.monthrange(
-                dt.strptime(day, "%Y-%m-%d").year, dt.strptime(day, "%Y-%m-%d").month
-            )[1]
-        ).strftime("%Y-%m-%d")
-        tasks = tasks_for_month(day)
-    elif view_type == "year":
-        start = dt.strptime(day, "%Y-%m-%d").replace(month=1, day=1).strftime("%Y-%m-%d")
-        end = dt.strptime(start, "%Y-%m-%d").replace(month=12, day=31).strftime("%Y-%m-%d")
-        tasks = tasks_for_year(day)
-    else:
-        raise ValueError("Invalid view type")
+    layout = tasks_layout(window, day, view_type, removing, hide_completed)
 
     window.addstr(2, 5, "tasks for ")
-    window.addstr(f"< {start} - {end} >", curses.color_pair(1 + 4 * (selected[0] == 2)))
-
-    tasks_by_parent = {}
-    orphaned_tasks = []
-
-    # process tasks
-    for task in tasks:
-        if view_type in ["month", "year"]:
-            if task['due_type'] == "month":
-                task['due_date'] = task['due_date'][:7]
-            elif task['due_type'] == "year":
-                task['due_date'] = task['due_date'][:4]
-        parent_id = task['parent']
-        if not parent_id or parent_id not in [t['id'] for t in tasks]:
-            orphaned_tasks.append(task)
-        else:
-            tasks_by_parent.setdefault(parent_id, []).append(task)
-
-    # data table for display
-    data = [['id', '', 'task', 'due', 'priority', 'part of', 'removing']]
-
-    # recursively render orphaned tasks and their children
-    for task in orphaned_tasks:
-        render_task_and_children(
-            window, data,
-            task, tasks_by_parent,
-            0, day, removing, hide_completed
-        )
+    window.addstr(
+        f"< {layout['start']} - {layout['end']} >",
+        curses.color_pair(1 + 4 * (selected[0] == 2))
+    )
 
     # draw the table
-    draw_task_table(window, data, 4, 5, selected, removing)
+    bottom_y = draw_task_table(
+        window, layout["data"], layout["column_widths"], 4, 5, selected, removing, scroll
+    )
 
-    # calculate and display completed tasks
-    due_tasks = [task for task in tasks if start <= task['due_date'] <= end]
-    completed_tasks = len([task for task in due_tasks if task['completed']])
+    # display completed tasks
     completion_percentage = (
-        str(round(completed_tasks / len(due_tasks) * 100, 2)) + "%"
-        if len(due_tasks) else "n/a"
+        str(round(layout["completed"] / layout["due"] * 100, 2)) + "%"
+        if layout["due"] else "n/a"
     )
     window.addstr(
-        len(data) + 8, 5,
+        bottom_y + 2, 5,
         (
             f"completed tasks due this {view_type}: "
-            + f"({completed_tasks}/{len(due_tasks)}) ({completion_percentage})"
+            + f"({layout['completed']}/{layout['due']}) ({completion_percentage})"
         )
     )
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules in src import each other by name, the same way main.py runs them
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,62 @@
+import random
+from datetime import date, timedelta
+
+from indexes import DateIndex
+
+def old_key(task):
+    """unfinished tasks first, then the latest due date first."""
+    return int(task['completed']), -date.fromisoformat(task['due_date']).toordinal()
+
+def day_tasks(tasks, day):
+    """the tasks shown on a day, sorted the way tasks_for_day sorted them before the index."""
+    shown = [
+        task_id for task_id, task in tasks.items() if (
+            day in (task['due_date'], task['date_added'])
+            or any(
+                first[1] == second[0] == day
+                for first, second in zip(task['date_history'], task['date_history'][1:])
+            )
+        )
+    ]
+    shown.sort(key=lambda task_id: old_key(tasks[task_id]))
+    return shown
+
+def loop_order(tasks, start, end):
+    """the order tasks_for_days gave by going through the days one by one."""
+    task_ids = []
+    for offset in range((end - start).days + 1):
+        for task_id in day_tasks(tasks, (start + timedelta(days=offset)).isoformat()):
+            if task_id not in task_ids:
+                task_ids.append(task_id)
+    task_ids.sort(key=lambda task_id: old_key(tasks[task_id]))
+    return task_ids
+
+def random_tasks(rng, count, start):
+    """tasks over a few weeks, with many of them due on the same day."""
+    tasks = {}
+    for i in range(count):
+        added = start + timedelta(days=rng.randrange(21))
+        due = added + timedelta(days=rng.randrange(7))
+        history = [[added.isoformat(), due.isoformat()]]
+        if rng.random() < 0.3:
+            due += timedelta(days=rng.randrange(1, 5))
+            history.append([history[0][1], due.isoformat()])
+        tasks[f"task{i}"] = {
+            "completed": rng.random() < 0.3,
+            "due_date": due.isoformat(),
+            "date_added": added.isoformat(),
+            "date_history": history,
+        }
+    return tasks
+
+def test_between_keeps_the_order_of_the_first_day_shown():
+    rng = random.Random(0)
+    start = date(2024, 1, 1)
+    tasks = random_tasks(rng, 300, start)
+    index = DateIndex().sync(tasks, 0)
+    for first, days in [(0, 0), (3, 6), (7, 6), (0, 30), (10, 3)]:
+        first_day = start + timedelta(days=first)
+        last_day = first_day + timedelta(days=days)
+        assert index.between(first_day.isoformat(), last_day.isoformat()) == loop_order(
+            tasks, first_day, last_day
+        )
@@ -0,0 +1,68 @@
+import random
+
+from datetime import date, timedelta
+
+import pytest
+
+import rollups
+
+from generate import generate_habits
+from modules import Habit, DurationHabit
+
+numpy = pytest.importorskip("numpy")
+
+TODAY = date.today()
+
+def rollup(habits, monkeypatch, use_numpy):
+    """return the arrays and the heatmap buckets of each habit, with or without numpy."""
+    monkeypatch.setattr(rollups, "numpy", numpy if use_numpy else None)
+    index = rollups.Rollups().sync(habits, 0)
+    results = {}
+    for habit_id in habits:
+        results[habit_id] = {
+            "first": index.first.get(habit_id),
+            "days": [float(value) for value in index.days.get(habit_id, [])],
+            "sums": [float(value) for value in index.sums.get(habit_id, [])],
+        }
+        for based_on, step in [("day", 1), ("week", 7), ("month", 30), ("year", 365)]:
+            dates = [TODAY - timedelta(days=step * i) for i in reversed(range(40))]
+            results[habit_id][based_on] = index.buckets(habit_id, based_on, dates, TODAY)
+    return results
+
+def assert_same_rollups(habits, monkeypatch):
+    with_numpy = rollup(habits, monkeypatch, True)
+    without_numpy = rollup(habits, monkeypatch, False)
+    assert with_numpy.keys() == without_numpy.keys()
+    for habit_id, results in with_numpy.items():
+        for name, values in results.items():
+            assert values == pytest.approx(without_numpy[habit_id][name]), (habit_id, name)
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_generated_habits(seed, monkeypatch):
+    assert_same_rollups(generate_habits(random.Random(seed), 2, 2, TODAY), monkeypatch)
+
+def test_empty_habits(monkeypatch):
+    habits = {}
+    for habit in [
+        DurationHabit("sleep"),
+        Habit("water", "progress", "cup/cups", 8),
+        Habit("pushups", "frequency", "time/times"),
+    ]:
+        habits[habit.id] = vars(habit)
+    assert_same_rollups(habits, monkeypatch)
+    assert all(not results["sums"] for results in rollup(habits, monkeypatch, False).values())
+
+def test_single_day(monkeypatch):
+    day = TODAY - timedelta(days=3)
+    sleep = DurationHabit("sleep", target_value=8)
+    sleep.data = [[f"{day.isoformat()}-22:00", f"{day.isoformat()}-23:30"]]
+    water = Habit("water", "progress", "cup/cups", 8)
+    water.data = {day.isoformat(): 6}
+    pushups = Habit("pushups", "frequency", "time/times")
+    pushups.data = {day.isoformat(): 3}
+    habits = {habit.id: vars(habit) for habit in [sleep, water, pushups]}
+    assert_same_rollups(habits, monkeypatch)
+    results = rollup(habits, monkeypatch, False)
+    assert results[sleep.id]["days"] == pytest.approx([1.5 / 8])
+    assert results[water.id]["days"] == pytest.approx([6 / 8])
+    assert results[pushups.id]["days"] == pytest.approx([1.0])